@@ -0,0 +1,168 @@
+"""Aborted clients under load: is abandoned LLM work cancelled?
+
+Starts benchmarks/fake_groq.py, then drives POST /study through the ASGI app
+in-process with many concurrent clients, a share of which disconnect before
+the completion arrives. Prints how quickly handlers give up after the
+disconnect, the backend's cancelled-work counters (as in /metrics) and how
+many provider calls were cancelled mid-flight. Requires MONGODB_URI; a
+throwaway user and lecture are created and removed again.
+
+    python benchmarks/bench_disconnects.py --requests 200 --concurrency 50 --abort-share 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import socket
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LECTURE_TEXT = "The TCP three-way handshake establishes a connection before data flows. " * 100
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("fake provider did not start")
+
+
+async def asgi_post(app, path: str, payload: dict, token: str, abort_after=None) -> tuple:
+    """POST through the ASGI app; the client disconnects abort_after seconds in, if given.
+
+    Returns (status or None, seconds from disconnect to handler exit or None).
+    """
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 80),
+        "headers": [
+            (b"host", b"bench"), (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()), (b"authorization", f"Bearer {token}".encode()),
+        ],
+    }
+    started = time.perf_counter()
+    disconnect_at = started + abort_after if abort_after is not None else None
+    response_done = asyncio.Event()
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        if disconnect_at is None:
+            await response_done.wait()
+        elif time.perf_counter() < disconnect_at:
+            # Disconnect polls cancel this wait, so sleep toward the same absolute deadline each time
+            await asyncio.sleep(disconnect_at - time.perf_counter())
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    finished = time.perf_counter()
+    if disconnect_at is not None and finished > disconnect_at:
+        return status, finished - disconnect_at
+    return status, None
+
+
+async def run(args, provider_port):
+    import main
+
+    await main.init_backend(retry_forever=False)
+    if main.lectures_collection is None:
+        raise SystemExit("MongoDB is not available (is MONGODB_URI set and reachable?)")
+    username = f"bench_disconnect_{os.getpid()}"
+    lecture = {"username": username, "course_name": "bench", "lecture_name": "handshake"}
+    await main.users_collection.insert_one({"username": username, "password": "!"})
+    await main.lectures_collection.insert_one({**lecture, "file_path": "", "lecture_text": LECTURE_TEXT})
+    token = main.create_access_token({"sub": username}, main.datetime.timedelta(hours=1))
+
+    statuses, give_up_delays = {}, []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        abort_after = random.uniform(0.1, args.latency) if random.random() < args.abort_share else None
+        payload = {"task": "Summarize", "lecture_name": "handshake"}
+        async with semaphore:
+            status, give_up = await asgi_post(main.app, "/study", payload, token, abort_after)
+        key = "aborted" if abort_after is not None else "completed"
+        statuses.setdefault(key, {}).setdefault(status, 0)
+        statuses[key][status] += 1
+        if give_up is not None:
+            give_up_delays.append(give_up)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await main.lectures_collection.delete_one(lecture)
+        await main.users_collection.delete_one({"username": username})
+
+    await asyncio.sleep(0.2)
+    with urllib.request.urlopen(f"http://127.0.0.1:{provider_port}/calls", timeout=5) as response:
+        provider_calls = json.load(response)
+    give_up_delays.sort()
+    pct = lambda p: give_up_delays[min(len(give_up_delays) - 1, int(len(give_up_delays) * p))] * 1000 if give_up_delays else float("nan")
+    print(f"{args.requests} requests in {elapsed:.1f}s with concurrency {args.concurrency}")
+    for key, counts in statuses.items():
+        print(f"  {key:<10} statuses {dict(sorted(counts.items(), key=lambda item: str(item[0])))}")
+    print(f"handler exit after disconnect: p50={pct(0.5):.0f}ms p95={pct(0.95):.0f}ms max={pct(1.0):.0f}ms "
+          f"(poll interval {main.DISCONNECT_POLL_SECONDS * 1000:.0f}ms)")
+    print(f"backend cancelled work: {main.cancelled_work}")
+    print(f"provider calls: {provider_calls['total']} total, {provider_calls['cancelled']} cancelled mid-flight")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--abort-share", type=float, default=0.5, help="fraction of clients that disconnect early")
+    parser.add_argument("--latency", type=float, default=3.0, help="mean provider latency in seconds")
+    args = parser.parse_args()
+
+    port = free_port()
+    provider = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_groq:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "FAKE_LATENCY": f"llama3-70b-8192={args.latency},llama3-8b-8192={args.latency}"},
+    )
+    try:
+        wait_until_up(port)
+        os.environ.update({
+            "GROQ_BASE_URL": f"http://127.0.0.1:{port}",
+            "GROQ_API_KEY": "gsk_fake_key_for_local_benchmarks",
+            "LOG_LEVEL": "WARNING",
+        })
+        sys.path.insert(0, BACKEND_DIR)
+        asyncio.run(run(args, port))
+    finally:
+        provider.terminate()
+        provider.wait()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,94 @@
+"""Overhead of request logging on the event loop.
+
+Simulates concurrent requests that log like upload_lecture (one INFO line,
+per-page DEBUG lines, an authentication DEBUG line) and compares:
+
+  baseline    logging.basicConfig(DEBUG) with eager f-strings, synchronous writes
+  structured  configure_logging(): queue handler, lazy %-args, JSON, INFO level
+  sampled     configure_logging() at DEBUG with LOG_DEBUG_SAMPLE_RATE sampling
+
+Output goes to a temporary file so write cost is included.
+
+    python benchmarks/bench_logging.py --requests 2000 --pages 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_logging import configure_logging, stop_logging  # noqa: E402
+
+logger = logging.getLogger("bench")
+
+
+async def request_eager(i, pages):
+    logger.debug(f"Authenticated user: user{i}")
+    logger.info(f"Upload request: lecture=lec{i}, course=course, size={i * 1024}")
+    for page in range(pages):
+        logger.debug(f"Extracted text from page {page + 1} (length: {page * 37})")
+    await asyncio.sleep(0)
+
+
+async def request_lazy(i, pages):
+    logger.debug("Authenticated user: %s", f"user{i}")
+    logger.info("Upload request: lecture=%s, course=%s, size=%s", f"lec{i}", "course", i * 1024)
+    for page in range(pages):
+        logger.debug("Extracted text from page %s (length: %s)", page + 1, page * 37)
+    await asyncio.sleep(0)
+
+
+async def drive(handler, requests, pages, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await handler(i, pages)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "baseline.log"), "w") as out:
+            reset_root()
+            logging.basicConfig(level=logging.DEBUG, stream=out, force=True)
+            results["baseline"] = asyncio.run(drive(request_eager, args.requests, args.pages, args.concurrency))
+
+        with open(os.path.join(tmp, "structured.log"), "w") as out:
+            configure_logging(level="INFO", stream=out)
+            results["structured"] = asyncio.run(drive(request_lazy, args.requests, args.pages, args.concurrency))
+            stop_logging()
+
+        with open(os.path.join(tmp, "sampled.log"), "w") as out:
+            configure_logging(level="DEBUG", debug_sample_rate=0.1, stream=out)
+            results["sampled"] = asyncio.run(drive(request_lazy, args.requests, args.pages, args.concurrency))
+            stop_logging()
+
+    records = args.requests * (args.pages + 2)
+    for name, seconds in results.items():
+        print(f"{name:<11} {seconds * 1000:8.1f} ms on the loop  "
+              f"{seconds / records * 1e6:6.2f} us/record  {args.requests / seconds:9.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latency of model routing (hedging, fallback, circuit breaker) against the fake provider.
+
+Starts benchmarks/fake_groq.py with a slow, flaky primary and a fast
+fallback, then issues concurrent completions through main.invoke_chat_model
+and prints latency percentiles, timeouts and per-model router stats.
+
+    python benchmarks/bench_router.py --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("fake provider did not start")
+
+
+async def run(args):
+    import main
+
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await main.invoke_chat_model(f"question {i} " * 50, task="Summarize", timeout=args.timeout)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float("nan")
+    print(f"ok={len(latencies)} failed={failures} p50={pct(0.5):.0f}ms p95={pct(0.95):.0f}ms p99={pct(0.99):.0f}ms")
+    for model, stats in main.model_router.as_dict().items():
+        print(f"  {model}: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--primary-latency", type=float, default=3.0)
+    parser.add_argument("--primary-error-rate", type=float, default=0.1)
+    parser.add_argument("--fallback-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "FAKE_LATENCY": f"llama3-70b-8192={args.primary_latency},llama3-8b-8192={args.fallback_latency}",
+        "FAKE_ERROR_RATE": f"llama3-70b-8192={args.primary_error_rate}",
+    }
+    provider = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_groq:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        wait_until_up(port)
+        os.environ.update({
+            "GROQ_BASE_URL": f"http://127.0.0.1:{port}",
+            "GROQ_API_KEY": "gsk_fake_key_for_local_benchmarks",
+            "LOG_LEVEL": "WARNING",
+        })
+        sys.path.insert(0, BACKEND_DIR)
+        asyncio.run(run(args))
+    finally:
+        provider.terminate()
+        provider.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""JSON serialization speed and bytes on the wire for typical /exam and /study payloads.
+
+Compares the stdlib encoder (JSONResponse) with orjson (ORJSONResponse) and
+reports response sizes raw, gzip and brotli at the levels used by
+CompressionMiddleware.
+
+    python benchmarks/bench_serialization.py
+"""
+import gzip
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import BROTLI_QUALITY, GZIP_LEVEL  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SENTENCE = (
+    "The TCP three-way handshake establishes a connection: the client sends SYN, "
+    "the server answers SYN-ACK and the client confirms with ACK before data flows. "
+)
+
+
+def exam_payload(n_questions=10):
+    questions = []
+    for idx in range(n_questions):
+        questions.append({
+            "id": f"mcq_Lecture_03_networking_{idx}",
+            "lecture_name": "Lecture_03_networking",
+            "question": f"{idx + 1}. Which statement about the handshake step {idx} is correct?",
+            "type": "mcq",
+            "options": [
+                f"A) The client sends SYN and waits for step {idx}",
+                f"B) The server replies with a FIN segment at step {idx}",
+                f"C) Both sides exchange sequence numbers at step {idx}",
+                f"D) No acknowledgement is required at step {idx}",
+            ],
+            "correct_answer": "C",
+        })
+    return {"questions": questions}
+
+
+def study_payload(chars=6000):
+    text = "## Summary\n" + "".join(f"- {SENTENCE}\n" for _ in range(chars // len(SENTENCE)))
+    return {"content": text}
+
+
+def bench(name, payload, number=2000):
+    stdlib = lambda: json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    body = stdlib()
+    t_std = timeit.timeit(stdlib, number=number) / number * 1e6
+    line = f"{name:<14} stdlib {t_std:7.1f} us"
+    if orjson is not None:
+        t_or = timeit.timeit(lambda: orjson.dumps(payload), number=number) / number * 1e6
+        line += f" | orjson {t_or:7.1f} us ({t_std / t_or:4.1f}x)"
+    print(line)
+
+    sizes = f"{'':<14} raw {len(body):7d} B | gzip-{GZIP_LEVEL} {len(gzip.compress(body, GZIP_LEVEL)):6d} B"
+    if brotli is not None:
+        sizes += f" | br-{BROTLI_QUALITY} {len(brotli.compress(body, quality=BROTLI_QUALITY)):6d} B"
+    t_gz = timeit.timeit(lambda: gzip.compress(body, GZIP_LEVEL), number=200) / 200 * 1e6
+    sizes += f" | gzip cost {t_gz:6.1f} us"
+    if brotli is not None:
+        t_br = timeit.timeit(lambda: brotli.compress(body, quality=BROTLI_QUALITY), number=200) / 200 * 1e6
+        sizes += f" | br cost {t_br:6.1f} us"
+    print(sizes)
+
+
+def main():
+    bench("/exam (10)", exam_payload(10))
+    bench("/exam (50)", exam_payload(50))
+    bench("/study", study_payload())
+
+
+if __name__ == "__main__":
+    main()
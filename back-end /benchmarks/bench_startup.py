@@ -0,0 +1,92 @@
+"""Cold-start cost of the API: import time and time-to-first-request.
+
+For each run a fresh interpreter imports `main` (import time), then a fresh
+uvicorn process is started and /health/live and /health/ready are polled to
+record time-to-first-request and time-to-ready. /health/ready only turns 200
+when MONGODB_URI points at a reachable MongoDB.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV = {**os.environ, "LOG_LEVEL": "WARNING"}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds():
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=ENV,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def poll(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                return resp.status
+        except urllib.error.HTTPError:
+            pass
+        except OSError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def serve_seconds(ready_timeout):
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=ENV,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        poll(f"{base}/health/live", started + 60)
+        first_request = time.perf_counter() - started
+        ready = poll(f"{base}/health/ready", time.perf_counter() + ready_timeout)
+        ready_after = time.perf_counter() - started if ready == 200 else None
+    finally:
+        server.terminate()
+        server.wait()
+    return first_request, ready_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    imports, firsts, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(import_seconds())
+        first, ready = serve_seconds(args.ready_timeout)
+        firsts.append(first)
+        if ready is not None:
+            readies.append(ready)
+
+    print(f"import main:            median {statistics.median(imports) * 1000:8.1f} ms")
+    print(f"time to first request:  median {statistics.median(firsts) * 1000:8.1f} ms")
+    if readies:
+        print(f"time to ready:          median {statistics.median(readies) * 1000:8.1f} ms")
+    else:
+        print("time to ready:          not reached (is MONGODB_URI set and reachable?)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Storage ratio, read latency and decompression cost of compressed lecture text.
+
+Compresses typical lecture texts (synthetic by default, or text extracted from
+a directory of PDFs) with the codecs text_storage can use and reports the
+ratio and the CPU cost of compressing and decompressing. With MONGODB_URI set
+it also writes the texts plain and compressed to scratch collections and
+compares BSON data size, storage size and find_one latency, including the
+decompression in the read path. The scratch collections are dropped again.
+
+    python benchmarks/bench_storage.py --lectures 200
+    python benchmarks/bench_storage.py --pdf-dir ./cs101_slides
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_storage import ZLIB_LEVEL, ZSTD_LEVEL, compress_text, decompress_text, zstd  # noqa: E402
+
+WORDS = (
+    "protocol packet handshake router latency throughput congestion window segment acknowledgement "
+    "sequence number checksum header payload layer transport network link physical address subnet "
+    "mask gateway routing table algorithm shortest path distance vector state flooding broadcast "
+    "multicast unicast socket port connection stream datagram reliable ordered delivery timeout "
+    "retransmission buffer queue scheduler fairness bandwidth delay jitter loss recovery example "
+    "definition theorem proof lemma corollary figure table equation slide lecture chapter summary"
+).split()
+
+
+def synthetic_lecture(chars: int, rng: random.Random) -> str:
+    lines, size = [], 0
+    while size < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+        if rng.random() < 0.1:
+            sentence = f"{rng.randint(1, 9)}.{rng.randint(1, 9)} {sentence.upper()[:40]}"
+        lines.append(sentence)
+        size += len(sentence) + 1
+    return "\n".join(lines)[:chars]
+
+
+def load_lectures(args) -> list:
+    if args.pdf_dir:
+        import main
+        texts = []
+        for entry in sorted(os.scandir(args.pdf_dir), key=lambda e: e.name):
+            if not entry.name.lower().endswith(".pdf"):
+                continue
+            try:
+                text = "\n".join(main.read_pdf_pages(entry.path))[:main.MAX_TEXT_LENGTH]
+            except Exception as e:
+                print(f"Skipping {entry.name}: {e}")
+                continue
+            if text.strip():
+                texts.append(text)
+        return texts
+    rng = random.Random(42)
+    return [synthetic_lecture(args.chars, rng) for _ in range(args.lectures)]
+
+
+def bench_codecs(texts: list):
+    raw = [text.encode() for text in texts]
+    total = sum(len(r) for r in raw)
+    codecs = {f"zlib-{ZLIB_LEVEL}": (lambda r: zlib.compress(r, ZLIB_LEVEL), zlib.decompress)}
+    if zstd is not None:
+        for level in sorted({1, ZSTD_LEVEL, 9}):
+            codecs[f"zstd-{level}"] = (lambda r, level=level: zstd.compress(r, level=level), zstd.decompress)
+    print(f"{len(texts)} lectures, {total / len(texts) / 1024:.1f} KB of text on average")
+    for name, (compress, decompress) in codecs.items():
+        packed = [compress(r) for r in raw]
+        ratio = total / sum(len(p) for p in packed)
+        t_c = timeit.timeit(lambda: [compress(r) for r in raw], number=5) / 5 / len(raw) * 1e6
+        t_d = timeit.timeit(lambda: [decompress(p) for p in packed], number=20) / 20 / len(raw) * 1e6
+        print(f"  {name:<8} ratio {ratio:4.2f}x | compress {t_c:6.1f} us | decompress {t_d:5.1f} us per lecture")
+
+
+async def bench_mongo(texts: list, reads: int):
+    import motor.motor_asyncio
+    import main
+    client = motor.motor_asyncio.AsyncIOMotorClient(main.MONGODB_URI, compressors=main.MONGODB_COMPRESSORS)
+    db = client.student_assistant
+    print(f"\nMongoDB (wire compressors: {main.MONGODB_COMPRESSORS})")
+    try:
+        for label, encode in (("plain", lambda t: t), ("compressed", compress_text)):
+            collection = db[f"bench_storage_{label}_{os.getpid()}"]
+            result = await collection.insert_many([{"lecture_text": encode(text)} for text in texts])
+            ids = result.inserted_ids
+            stats = await db.command("collStats", collection.name)
+            latencies = []
+            for _ in range(reads):
+                started = time.perf_counter()
+                doc = await collection.find_one({"_id": random.choice(ids)})
+                decompress_text(doc["lecture_text"])
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            print(f"  {label:<10} data {stats['size'] / 1024:8.1f} KB | storage {stats['storageSize'] / 1024:8.1f} KB | "
+                  f"find_one p50 {latencies[len(latencies) // 2] * 1000:.2f} ms "
+                  f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms")
+            await collection.drop()
+    finally:
+        client.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lectures", type=int, default=200, help="synthetic lectures to generate")
+    parser.add_argument("--chars", type=int, default=10000, help="characters per synthetic lecture")
+    parser.add_argument("--pdf-dir", help="use text extracted from these PDFs instead")
+    parser.add_argument("--reads", type=int, default=500, help="find_one calls per variant")
+    args = parser.parse_args()
+
+    texts = load_lectures(args)
+    if not texts:
+        raise SystemExit("No lecture text to benchmark")
+    bench_codecs(texts)
+    if os.getenv("MONGODB_URI"):
+        asyncio.run(bench_mongo(texts, args.reads))
+    else:
+        print("\nSet MONGODB_URI to also measure storage size and read latency in MongoDB")
+
+
+if __name__ == "__main__":
+    main_cli()
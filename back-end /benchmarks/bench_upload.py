@@ -0,0 +1,117 @@
+"""Upload receive throughput (MB/s) and time to reject bad PDFs.
+
+Replays the receive loop of POST /lectures against an in-memory UploadFile:
+the previous path (NamedTemporaryFile reopened with aiofiles, 8 KB chunks)
+and the streaming path (one buffered handle, PdfStreamInspector, sha256) at
+several chunk sizes. Also times how early non-PDF and truncated uploads
+are rejected compared with receiving the whole file.
+
+    python benchmarks/bench_upload.py --size-mb 5 --rounds 20
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile  # noqa: E402
+
+from pdf_stream import InvalidPdfUpload, PdfStreamInspector  # noqa: E402
+
+try:
+    import aiofiles  # the previous upload path; no longer a dependency
+except ImportError:
+    aiofiles = None
+
+
+def synthetic_pdf(size: int, pages: int = 20) -> bytes:
+    body = bytearray(b"%PDF-1.4\n")
+    filler = os.urandom(size // max(pages, 1))
+    for page in range(pages):
+        body += f"{page + 4} 0 obj\n<< /Type /Page /Parent 2 0 R >>\nstream\n".encode()
+        body += filler + b"\nendstream\nendobj\n"
+    trailer = b"trailer\n<< /Size 3 /Root 1 0 R >>\n"
+    return bytes(body) + trailer + b"startxref\n0\n%%EOF\n"
+
+
+async def receive_aiofiles(upload: UploadFile, directory: str) -> int:
+    total = 0
+    with tempfile.NamedTemporaryFile(delete=False, dir=directory, suffix=".pdf") as temp_file:
+        async with aiofiles.open(temp_file.name, "wb") as f:
+            while chunk := await upload.read(8192):
+                total += len(chunk)
+                await f.write(chunk)
+    os.remove(temp_file.name)
+    return total
+
+
+async def receive_streaming(upload: UploadFile, directory: str, chunk_size: int) -> int:
+    inspector = PdfStreamInspector()
+    with tempfile.NamedTemporaryFile(delete=False, dir=directory, suffix=".pdf", buffering=chunk_size) as temp_file:
+        def store_chunk(chunk):
+            inspector.feed(chunk)
+            temp_file.write(chunk)
+        try:
+            while chunk := await upload.read(chunk_size):
+                await asyncio.to_thread(store_chunk, chunk)
+            inspector.finish()
+        finally:
+            temp_file.close()
+            os.remove(temp_file.name)
+    return inspector.size
+
+
+async def timed(receive, data: bytes, rounds: int) -> float:
+    """Median seconds per receive of data."""
+    samples = []
+    for _ in range(rounds):
+        upload = UploadFile(io.BytesIO(data), size=len(data), filename="lecture.pdf")
+        started = time.perf_counter()
+        try:
+            await receive(upload)
+        except InvalidPdfUpload:
+            pass
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+
+async def run(args):
+    size = int(args.size_mb * 1024 * 1024)
+    good = synthetic_pdf(size)
+    directory = tempfile.mkdtemp(prefix="bench-upload-")
+    mb = len(good) / 1024 / 1024
+    try:
+        baseline = None
+        if aiofiles is not None:
+            baseline = await timed(lambda u: receive_aiofiles(u, directory), good, args.rounds)
+            print(f"{'aiofiles 8 KB':<22} {baseline * 1000:8.1f} ms  {mb / baseline:8.1f} MB/s")
+        for chunk_kb in (64, 256, 1024):
+            elapsed = await timed(lambda u: receive_streaming(u, directory, chunk_kb * 1024), good, args.rounds)
+            speedup = f" ({baseline / elapsed:4.1f}x)" if baseline else ""
+            print(f"{f'streaming {chunk_kb} KB':<22} {elapsed * 1000:8.1f} ms  {mb / elapsed:8.1f} MB/s{speedup}")
+
+        print("\nRejection (streaming, 256 KB chunks) vs receiving the whole file:")
+        cases = {
+            "not a PDF": b"PK\x03\x04" + good[4:],
+            "truncated": good[: len(good) // 2],
+        }
+        for name, data in cases.items():
+            elapsed = await timed(lambda u: receive_streaming(u, directory, 256 * 1024), data, args.rounds)
+            print(f"{name:<22} {elapsed * 1000:8.1f} ms")
+    finally:
+        os.rmdir(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=5)
+    parser.add_argument("--rounds", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Throughput scaling of the API from 1 to N uvicorn worker processes.
+
+Starts `uvicorn main:app --workers n` for each n, drives GET /resources with
+keep-alive connections from several load-generator processes and prints
+requests/second per worker count. Requires MONGODB_URI (startup connects to
+MongoDB in every worker).
+
+    python benchmarks/bench_workers.py --max-workers 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port, timeout=90):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def _client(port, path, deadline, counter):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+    while time.time() < deadline:
+        writer.write(request)
+        await writer.drain()
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in headers.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        counter[0] += 1
+    writer.close()
+
+
+def _load_process(port, path, duration, connections, queue):
+    async def run():
+        counter = [0]
+        deadline = time.time() + duration
+        await asyncio.gather(*(_client(port, path, deadline, counter) for _ in range(connections)))
+        return counter[0]
+    queue.put(asyncio.run(run()))
+
+
+def measure(port, path, duration, processes, connections):
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_load_process, args=(port, path, duration, connections, queue))
+        for _ in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    total = sum(queue.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/resources")
+    parser.add_argument("--load-processes", type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--connections", type=int, default=32, help="connections per load process")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for workers in range(1, args.max_workers + 1):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "LOG_LEVEL": "WARNING"},
+        )
+        try:
+            wait_until_up(port)
+            time.sleep(1)  # let every worker finish its startup event
+            rps = measure(port, args.path, args.duration, args.load_processes, args.connections)
+        finally:
+            server.terminate()
+            server.wait()
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.1f} {rps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Local stand-in for the Groq chat completions API.
+
+Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:<port> and any
+GROQ_API_KEY of the form gsk_... . Per-model latency and error rate are set
+through the environment, e.g.
+
+    FAKE_LATENCY="llama3-70b-8192=4.0,llama3-8b-8192=0.3" \\
+    FAKE_ERROR_RATE="llama3-70b-8192=0.2" \\
+    uvicorn benchmarks.fake_groq:app --port 9000
+
+Latencies are the mean of an exponential distribution, so the slow model
+also has a long tail.
+"""
+import asyncio
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _per_model(env_name, default):
+    values = {}
+    for item in os.getenv(env_name, "").split(","):
+        if "=" in item:
+            model, value = item.split("=", 1)
+            values[model.strip()] = float(value)
+    return lambda model: values.get(model, default)
+
+
+latency_for = _per_model("FAKE_LATENCY", 0.5)
+error_rate_for = _per_model("FAKE_ERROR_RATE", 0.0)
+
+app = FastAPI()
+calls = {"total": 0, "cancelled": 0}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    calls["total"] += 1
+    deadline = time.monotonic() + random.expovariate(1 / latency_for(model))
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(0.05, deadline - time.monotonic()))
+            if await request.is_disconnected():
+                # The caller gave up (hedge loser, timeout or aborted client): stop "generating"
+                calls["cancelled"] += 1
+                return JSONResponse(status_code=499, content={"error": {"message": "client closed request"}})
+    except asyncio.CancelledError:
+        calls["cancelled"] += 1
+        raise
+    if random.random() < error_rate_for(model):
+        return JSONResponse(status_code=503, content={"error": {"message": f"{model} overloaded", "type": "server_error"}})
+    prompt = body["messages"][-1]["content"]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"[{model}] answer to {len(prompt)} prompt chars"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 8, "total_tokens": len(prompt) // 4 + 8},
+    }
+
+
+@app.get("/calls")
+async def call_counts():
+    return calls
@@ -0,0 +1,192 @@
+"""Bulk-import a directory or .zip archive of PDFs as lectures of one course.
+
+    python import_lectures.py --user alice --course CS101 ./cs101_slides
+    python import_lectures.py --user alice --course CS101 slides.zip --workers 8
+
+Lecture names are the file names without ".pdf" and must pass the same
+validate_name rules as POST /lectures. Text is extracted in parallel across
+processes and lectures are inserted with bulk writes. Lectures that already
+exist for the course are skipped, so an interrupted import can simply be
+re-run to resume.
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+
+import main
+import search_index
+
+
+def extract_lecture(pdf_path: str) -> tuple:
+    """Validate and extract one PDF in a worker process; returns (text, page offsets, sha256, error)."""
+    try:
+        main.validate_pdf(pdf_path)
+        pages = main.read_pdf_pages(pdf_path)
+        text = "\n".join(pages)
+        if not text.strip():
+            return None, [], None, "No extractable text in PDF"
+        sha256 = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            while chunk := f.read(main.UPLOAD_CHUNK_SIZE):
+                sha256.update(chunk)
+        return text, search_index.page_offsets(pages), sha256.hexdigest(), None
+    except HTTPException as he:
+        return None, [], None, he.detail
+    except Exception as e:
+        return None, [], None, str(e)
+
+
+def collect_pdfs(source: str, staging_dir: str) -> list:
+    """Return (lecture_name, path) pairs, unpacking archives into staging_dir."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            members = [m for m in archive.infolist() if not m.is_dir() and m.filename.lower().endswith(".pdf")]
+            for member in members:
+                target = os.path.join(staging_dir, os.path.basename(member.filename))
+                with archive.open(member) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        source = staging_dir
+    if not os.path.isdir(source):
+        raise SystemExit(f"{source} is neither a directory nor a zip archive")
+    return sorted(
+        (os.path.splitext(entry.name)[0], entry.path)
+        for entry in os.scandir(source)
+        if entry.is_file() and entry.name.lower().endswith(".pdf")
+    )
+
+
+async def insert_batch(batch: list) -> int:
+    """Insert (lecture doc, full text, page offsets) entries and index the full text of those inserted."""
+    from pymongo.errors import BulkWriteError
+    if not batch:
+        return 0
+    docs = [doc for doc, _, _ in batch]
+    try:
+        await main.lectures_collection.insert_many(
+            [main.compress_fields(doc, main.LECTURE_TEXT_FIELDS) for doc in docs], ordered=False
+        )
+        failed = set()
+    except BulkWriteError as e:
+        # Duplicates from a concurrent upload or a partially applied earlier batch
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+    inserted = [entry for i, entry in enumerate(batch) if i not in failed]
+    for doc, text, page_offsets in inserted:
+        try:
+            await main.index_lecture(doc, text, page_offsets)
+        except Exception as e:
+            print(f"  {doc['lecture_name']}: indexing failed ({e}); retried at the next server start", file=sys.stderr)
+            await main.defer_indexing(doc["username"], doc["course_name"], doc["lecture_name"])
+    await main.bump_user_version(docs[0]["username"])
+    return len(inserted)
+
+
+async def run_import(args) -> int:
+    await main.init_backend(retry_forever=False)
+    if main.lectures_collection is None:
+        print("MongoDB is not available (is MONGODB_URI set and reachable?)", file=sys.stderr)
+        return 1
+    if not await main.get_user(args.user):
+        print(f"User {args.user} not found", file=sys.stderr)
+        return 1
+    main.validate_name(args.course, "Course name")
+    if not await main.course_exists(args.user, args.course):
+        if not args.create_course:
+            print(f"Course {args.course} not found (use --create-course)", file=sys.stderr)
+            return 1
+        await main.create_course_db(args.user, args.course)
+
+    lectures_dir = os.path.join(main.USER_DATA_DIR, args.user, "lectures")
+    os.makedirs(lectures_dir, exist_ok=True)
+    existing = {
+        doc["lecture_name"]
+        for doc in await main.lectures_collection.find(
+            {"username": args.user, "course_name": args.course}, {"_id": 0, "lecture_name": 1}
+        ).to_list(None)
+    }
+
+    started = time.perf_counter()
+    imported = skipped = pages_total = bytes_total = 0
+    failed = []
+    with tempfile.TemporaryDirectory(dir=main.USER_DATA_DIR, prefix=".import-") as staging_dir:
+        pending = []
+        for lecture_name, path in collect_pdfs(args.source, staging_dir):
+            if lecture_name in existing:
+                skipped += 1
+                continue
+            if not main.NAME_PATTERN.match(lecture_name):
+                failed.append((lecture_name, "Lecture name must contain only letters, numbers, underscores, or hyphens"))
+                continue
+            size = os.path.getsize(path)
+            if size == 0 or size > main.MAX_FILE_SIZE:
+                failed.append((lecture_name, "Empty file" if size == 0 else "File too large"))
+                continue
+            pending.append((lecture_name, path, size))
+        print(f"{len(pending)} PDFs to import, {skipped} already imported, {len(failed)} rejected")
+
+        loop = asyncio.get_running_loop()
+        batch = []
+        # Spawned (not forked) workers: the parent holds Motor and logging threads
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            async def extract(lecture_name, path, size):
+                result = await loop.run_in_executor(pool, extract_lecture, path)
+                return (lecture_name, path, size) + result
+
+            for done in asyncio.as_completed([extract(*item) for item in pending]):
+                lecture_name, path, size, text, page_offsets, content_hash, error = await done
+                if error:
+                    failed.append((lecture_name, error))
+                    continue
+                lecture_path = os.path.join(lectures_dir, f"{lecture_name}.pdf")
+                partial_path = lecture_path + ".part"
+                shutil.copyfile(path, partial_path)
+                os.replace(partial_path, lecture_path)
+                doc = main.build_lecture_doc(
+                    args.user, args.course, lecture_name, lecture_path, text, page_offsets, content_hash
+                )
+                batch.append((doc, text, page_offsets))
+                pages_total += len(page_offsets)
+                bytes_total += size
+                if len(batch) >= args.batch_size:
+                    imported += await insert_batch(batch)
+                    batch = []
+            imported += await insert_batch(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"Imported {imported} lectures ({pages_total} pages, {bytes_total / 1024 / 1024:.1f} MB) "
+          f"in {elapsed:.1f}s: {imported / elapsed:.1f} lectures/s, {pages_total / elapsed:.1f} pages/s, "
+          f"{bytes_total / 1024 / 1024 / elapsed:.2f} MB/s with {args.workers} workers")
+    print(f"Skipped {skipped} existing, failed {len(failed)}")
+    for lecture_name, error in failed:
+        print(f"  {lecture_name}: {error}")
+    return 0 if not failed else 2
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory or .zip archive of PDFs")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--course", required=True)
+    parser.add_argument("--create-course", action="store_true", help="create the course if it does not exist")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="extraction processes")
+    parser.add_argument("--batch-size", type=int, default=50, help="lectures per bulk insert")
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(run_import(args)))
+    except HTTPException as he:
+        # validate_name / create_course_db report errors the way the API does
+        print(he.detail, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
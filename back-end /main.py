@@ -1,38 +1,63 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form, status, Request, APIRouter
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form, status, Request, APIRouter, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
 from passlib.context import CryptContext
 from typing import Optional, List, Dict
-import motor.motor_asyncio
 import jwt
 import datetime
-import PyPDF2
 import os
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from PyPDF2.errors import PdfReadError
-from langchain_groq import ChatGroq
-from langchain.prompts import PromptTemplate
 import re
 import logging
-import psutil
 import asyncio
-import aiofiles
 import tempfile
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, DuplicateKeyError
-from groq import Groq, APIError
-
-# Load environment variables
+import fcntl
+import threading
+import base64
+import hashlib
+import heapq
+import json
+from email.utils import format_datetime, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+
+# Optional fast paths: orjson for serialization, brotli for compression
+try:
+    import orjson  # noqa: F401  (used by ORJSONResponse)
+    APIResponse = ORJSONResponse
+except ImportError:
+    APIResponse = JSONResponse
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Load environment variables (before local modules read their settings)
 load_dotenv()
 
-# Initialize logging
-logging.basicConfig(level=os.getenv("LOG_LEVEL", "DEBUG"))
+from semantic_cache import SemanticCache
+from model_router import ModelRouter, LLM_MODELS
+from tracing import TracingMiddleware, ProfilingMiddleware, span
+from structured_logging import configure_logging
+import search_index
+from pdf_stream import PdfStreamInspector, InvalidPdfUpload
+from text_storage import compress_fields, decompress_fields, compress_text, decompress_text, zstd
+from storage_reconciler import StorageReconciler
+
+# Heavy dependencies (motor/pymongo, PyPDF2, LangChain, groq, psutil)
+# are imported on first use so the process can answer liveness probes quickly.
+
+# Initialize logging: JSON lines through a queue, written by a background thread
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=APIResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -51,6 +76,7 @@ app.add_middleware(
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "hsgdter453cnhfgdt658ddlkdk*m54wq")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ADMIN_USERS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}  # may request profiles
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -58,12 +84,132 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 # Configuration
 USER_DATA_DIR = "/app/user_data"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # override to point at a local fake provider
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+LLM_FAST_TASKS = {t.strip() for t in os.getenv("LLM_FAST_TASKS", "grading").split(",") if t.strip()}
+STUDY_PACK_MAX_TOKENS = int(os.getenv("STUDY_PACK_MAX_TOKENS", 1536))  # one completion holds three sections
+STUDY_CACHE_TTL_DAYS = int(os.getenv("STUDY_CACHE_TTL_DAYS", 30))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # in-flight completions per worker
+EXAM_QUESTIONS_PER_LECTURE = 10  # what EXAM_PROMPT asks for per lecture exam; course exams cap lectures at this
+EXAM_SPARE_QUESTIONS = 2  # extra questions asked per lecture in course exams, to replace near-duplicates
+EXAM_TOKENS_PER_QUESTION = int(os.getenv("EXAM_TOKENS_PER_QUESTION", 100))  # an MCQ with four options and its answer
+MAX_COURSE_EXAM_QUESTIONS = 50
 MONGODB_URI = os.getenv("MONGODB_URI")
+# Wire compression between the app and MongoDB; zstd needs backports.zstd before Python 3.14
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib" if zstd is not None else "zlib")
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_PDF_PAGES = 50  # Reduced page limit
 MAX_TEXT_LENGTH = 10000  # Max characters for ChatGroq input
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", 0.5))  # how often long handlers check the client
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # bytes per read/write while receiving a PDF
+# uvicorn worker processes; with SEMANTIC_CACHE_ENABLED each one also loads torch and the
+# embedding model at startup (several hundred MB per worker), so size memory for N copies
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", 8))  # per-worker threads for PDF/LLM calls
+STARTUP_LOCK_PATH = os.path.join(USER_DATA_DIR, ".startup.lock")
+RECLAIM_LOCK_PATH = os.path.join(USER_DATA_DIR, ".reclaim.lock")  # held by the one worker reclaiming storage
+DEFAULT_PAGE_SIZE = 100  # Courses/lectures per listing page
+MAX_PAGE_SIZE = 500
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 2.0))  # import + startup event
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # bytes; smaller bodies are sent as-is
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))  # low qualities keep per-request CPU small
 os.makedirs(USER_DATA_DIR, exist_ok=True)
 
+# Response compression negotiated through Accept-Encoding
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding] = q
+    # Highest q wins; "*" covers codings not listed; ties go to br (listed first)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(available, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+    return best if accepted.get(best, accepted.get("*", 0.0)) > 0 else None
+
+class CompressionMiddleware:
+    """Compresses complete (non-streaming) response bodies with brotli or gzip."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            response_start, start_message = start_message, None
+            body = message.get("body", b"")
+            response_headers = dict(response_start.get("headers", []))
+            content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in response_headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(response_start)
+                await send(message)
+                return
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            raw_headers = [
+                (name, value) for name, value in response_start.get("headers", [])
+                if name.lower() != b"content-length"
+            ]
+            raw_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**response_start, "headers": raw_headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Tracing (outermost, so every response carries a trace id) and admin-only profiling
+def is_admin_authorization(authorization: str) -> bool:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return False
+    return payload.get("sub") in ADMIN_USERS
+
+app.add_middleware(ProfilingMiddleware, authorize=is_admin_authorization)
+app.add_middleware(TracingMiddleware)
+
 # MongoDB client
 client = None
 db = None
@@ -71,6 +217,30 @@ users_collection = None
 courses_collection = None
 lectures_collection = None
 questions_collection = None
+meta_collection = None
+search_postings_collection = None
+search_docs_collection = None
+search_stats_collection = None
+study_cache_collection = None
+
+# Startup progress, reported by /health/ready
+startup_state = {
+    "mongodb": "pending",
+    "indexes": "pending",
+    "import_seconds": None,
+    "startup_seconds": None,
+    "ready_seconds": None,
+}
+
+# Work abandoned because the client disconnected first, reported by /metrics
+cancelled_work = {"llm": 0, "extraction": 0}
+
+# Per-worker semantic cache for "Custom Question" answers
+semantic_cache = SemanticCache()
+
+# Per-worker ChatGroq clients, created lazily on first use in each process
+_chat_models = {}
+_chat_models_pid = None
 
 # CORS headers
 def get_cors_headers():
@@ -89,7 +259,7 @@ def check_volume_writable():
         with open(test_file, "w") as f:
             f.write("test")
         os.remove(test_file)
-        logger.debug(f"Volume {USER_DATA_DIR} is writable")
+        logger.debug("Volume %s is writable", USER_DATA_DIR)
         return True
     except (OSError, PermissionError) as e:
         logger.error(f"Volume {USER_DATA_DIR} is not writable: {str(e)}")
@@ -97,6 +267,7 @@ def check_volume_writable():
 
 # Check disk space
 def check_disk_space():
+    import psutil
     disk = psutil.disk_usage(USER_DATA_DIR)
     if disk.percent > 85:
         logger.error(f"Disk usage too high: {disk.percent}%")
@@ -104,7 +275,7 @@ def check_disk_space():
             status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
             detail="Insufficient disk space"
         )
-    logger.debug(f"Disk usage: {disk.percent}% (Free: {disk.free/1024/1024:.2f}MB)")
+    logger.debug("Disk usage: %s%% (Free: %.2fMB)", disk.percent, disk.free/1024/1024)
     return disk
 
 # MongoDB setup
@@ -114,10 +285,12 @@ async def init_mongodb():
         raise HTTPException(status_code=500, detail="MONGODB_URI not configured")
     max_retries = 5
     retry_delay = 3
+    import motor.motor_asyncio
+    from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
     for attempt in range(max_retries):
         try:
             client = motor.motor_asyncio.AsyncIOMotorClient(
-                MONGODB_URI, serverSelectionTimeoutMS=5000
+                MONGODB_URI, serverSelectionTimeoutMS=5000, compressors=MONGODB_COMPRESSORS
             )
             await client.admin.command('ping')
             logger.info("MongoDB connected successfully")
@@ -130,27 +303,112 @@ async def init_mongodb():
             await asyncio.sleep(retry_delay)
             retry_delay *= 2
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    global client, db, users_collection, courses_collection, lectures_collection, questions_collection
+# Startup coordination: every worker process runs the startup event, but only
+# the worker holding the lock applies index creation / migrations.
+SCHEMA_VERSION = 5  # 2: search index, 3: study content cache, 4: compressed lecture text, 5: full-text search index
+
+# Large text fields are stored compressed (see text_storage) and decompressed on read
+LECTURE_TEXT_FIELDS = ("lecture_text",)
+
+def _acquire_startup_lock():
+    lock_file = open(STARTUP_LOCK_PATH, "a+")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+def _release_startup_lock(lock_file):
     try:
-        client = await init_mongodb()
-        db = client.student_assistant
-        users_collection = db.users
-        courses_collection = db.courses
-        lectures_collection = db.lectures
-        questions_collection = db.questions
-        logger.info("MongoDB collections initialized")
-        
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        lock_file.close()
+
+async def ensure_indexes():
+    await users_collection.create_index("username", unique=True)
+    await courses_collection.create_index([("username", 1), ("course_name", 1)], unique=True)
+    await lectures_collection.create_index([("username", 1), ("course_name", 1), ("lecture_name", 1)], unique=True)
+    await questions_collection.create_index("id", unique=True)
+    await search_postings_collection.create_index([("username", 1), ("term", 1)])
+    await search_postings_collection.create_index([("username", 1), ("course_name", 1), ("lecture_name", 1)])
+    await search_docs_collection.create_index([("username", 1), ("course_name", 1), ("lecture_name", 1)], unique=True)
+    await search_stats_collection.create_index("username", unique=True)
+    await study_cache_collection.create_index([("text_hash", 1), ("task", 1)], unique=True)
+    await study_cache_collection.create_index("created_at", expireAfterSeconds=STUDY_CACHE_TTL_DAYS * 86400)
+    await lectures_collection.create_index("search_pending", partialFilterExpression={"search_pending": True})
+    logger.info("MongoDB indexes created")
+
+async def lecture_index_source(lecture: Dict) -> tuple:
+    """(text, page offsets) to index: the full PDF text while the file exists, else the stored text."""
+    file_path = lecture.get("file_path")
+    if file_path and os.path.exists(file_path):
+        try:
+            pages = await asyncio.to_thread(read_pdf_pages, file_path)
+            if any(page.strip() for page in pages):
+                return "\n".join(pages), search_index.page_offsets(pages)
+        except Exception as e:
+            logger.warning(f"Could not re-read {file_path} for indexing: {str(e)}")
+    return lecture["lecture_text"], lecture.get("page_offsets")
+
+async def backfill_search_index():
+    """Index lectures that are not in the search index yet."""
+    indexed = 0
+    async for lecture in lectures_collection.find({}, {"_id": 0}):
+        if await search_docs_collection.find_one(
+            {"username": lecture["username"], "course_name": lecture["course_name"], "lecture_name": lecture["lecture_name"]},
+            {"_id": 1}
+        ):
+            continue
+        lecture = decompress_fields(lecture, LECTURE_TEXT_FIELDS)
+        await index_lecture(lecture, *await lecture_index_source(lecture))
+        indexed += 1
+    logger.info("Search index backfilled with %s lectures", indexed)
+
+async def reindex_pending_lectures():
+    """Index lectures whose indexing failed when they were created (see defer_indexing)."""
+    indexed = 0
+    async for lecture in lectures_collection.find({"search_pending": True}, {"_id": 0}):
+        key = {"username": lecture["username"], "course_name": lecture["course_name"], "lecture_name": lecture["lecture_name"]}
+        await search_postings_collection.delete_many(key)
+        lecture = decompress_fields(lecture, LECTURE_TEXT_FIELDS)
+        await index_lecture(lecture, *await lecture_index_source(lecture))
+        await lectures_collection.update_one(key, {"$unset": {"search_pending": ""}})
+        indexed += 1
+    if indexed:
+        logger.info("Indexed %s lectures left pending at upload", indexed)
+
+async def rebuild_search_index():
+    """Re-index every lecture; indexes before schema 5 covered only the truncated stored text."""
+    await search_postings_collection.delete_many({})
+    await search_docs_collection.delete_many({})
+    await search_stats_collection.delete_many({})
+    await backfill_search_index()
+
+async def compress_stored_text():
+    """Compress lecture text written before text compression existed."""
+    compressed = 0
+    async for lecture in lectures_collection.find({"lecture_text": {"$type": "string"}}, {"lecture_text": 1}):
+        stored = compress_text(lecture["lecture_text"])
+        if isinstance(stored, dict):
+            await lectures_collection.update_one(
+                {"_id": lecture["_id"], "lecture_text": {"$type": "string"}}, {"$set": {"lecture_text": stored}}
+            )
+            compressed += 1
+    logger.info("Compressed stored text of %s lectures", compressed)
+
+async def run_migrations():
+    lock_file = await asyncio.to_thread(_acquire_startup_lock)
+    try:
+        meta = await meta_collection.find_one({"_id": "schema"})
+        previous_version = meta.get("version", 0) if meta else 0
+        try:
+            await reindex_pending_lectures()
+        except Exception as e:
+            logger.error(f"Indexing pending lectures failed: {str(e)}")
+        if previous_version >= SCHEMA_VERSION:
+            logger.info("Schema version %s up to date (worker %s)", previous_version, os.getpid())
+            return
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                await users_collection.create_index("username", unique=True)
-                await courses_collection.create_index([("username", 1), ("course_name", 1)], unique=True)
-                await lectures_collection.create_index([("username", 1), ("course_name", 1), ("lecture_name", 1)], unique=True)
-                await questions_collection.create_index("id", unique=True)
-                logger.info("MongoDB indexes created")
+                await ensure_indexes()
                 break
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -158,9 +416,82 @@ async def startup_event():
                     raise HTTPException(status_code=500, detail="Index creation failed")
                 logger.warning(f"Index creation attempt {attempt + 1} failed. Retrying...")
                 await asyncio.sleep(3)
+        if previous_version < 5:
+            await rebuild_search_index()
+        if previous_version < 4:
+            await compress_stored_text()
+        await meta_collection.update_one(
+            {"_id": "schema"}, {"$set": {"version": SCHEMA_VERSION}}, upsert=True
+        )
+        logger.info("Schema migrated to version %s by worker %s", SCHEMA_VERSION, os.getpid())
+    finally:
+        await asyncio.to_thread(_release_startup_lock, lock_file)
+
+async def init_backend(retry_forever: bool = True):
+    """Connect and migrate; the server keeps retrying, CLIs pass retry_forever=False to give up."""
+    global client, db, users_collection, courses_collection, lectures_collection, questions_collection, meta_collection
+    global search_postings_collection, search_docs_collection, search_stats_collection, study_cache_collection
+    retry_delay = 30
+    while client is None:
+        try:
+            client = await init_mongodb()
+        except HTTPException as he:
+            startup_state["mongodb"] = "failed"
+            if not MONGODB_URI or not retry_forever:
+                return
+            logger.error(f"MongoDB unavailable ({he.detail}). Retrying in {retry_delay}s...")
+            await asyncio.sleep(retry_delay)
+    db = client.student_assistant
+    users_collection = db.users
+    courses_collection = db.courses
+    lectures_collection = db.lectures
+    questions_collection = db.questions
+    meta_collection = db.meta
+    search_postings_collection = db.search_postings
+    search_docs_collection = db.search_docs
+    search_stats_collection = db.search_stats
+    study_cache_collection = db.study_content
+    startup_state["mongodb"] = "connected"
+    startup_state["ready_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    logger.info("MongoDB collections initialized; ready after %ss", startup_state['ready_seconds'])
+    try:
+        await run_migrations()
+        startup_state["indexes"] = "ready"
     except Exception as e:
-        logger.error(f"MongoDB initialization failed: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="MongoDB initialization failed")
+        startup_state["indexes"] = "failed"
+        logger.error(f"MongoDB migration failed: {str(e)}", exc_info=True)
+
+# Startup event (runs once per worker process, after fork/spawn). MongoDB
+# connection and index creation run in the background so the worker starts
+# serving liveness probes immediately; /health/ready reports when it is usable.
+@app.on_event("startup")
+async def startup_event():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix=f"worker-{os.getpid()}")
+    )
+    app.state.init_task = asyncio.create_task(init_backend())
+    if semantic_cache.enabled:
+        app.state.cache_warmup_task = asyncio.create_task(semantic_cache.warm_up())
+    if storage_reconciler.interval > 0:
+        app.state.reclaim_task = asyncio.create_task(storage_reconciler.run_forever())
+    startup_state["startup_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    if startup_state["startup_seconds"] > STARTUP_BUDGET_SECONDS:
+        logger.warning(
+            f"Startup took {startup_state['startup_seconds']}s, over the {STARTUP_BUDGET_SECONDS}s budget "
+            f"(imports: {startup_state['import_seconds']}s)"
+        )
+    else:
+        logger.info("Worker %s accepting requests after %ss", os.getpid(), startup_state['startup_seconds'])
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("init_task", "cache_warmup_task", "reclaim_task"):
+        task = getattr(app.state, name, None)
+        if task is not None and not task.done():
+            task.cancel()
+    if client is not None:
+        client.close()
+        logger.info("MongoDB client closed (worker %s)", os.getpid())
 
 # Input validation
 NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_-]+$")
@@ -172,9 +503,15 @@ def validate_name(name: str, field: str):
             detail=f"{field} must contain only letters, numbers, underscores, or hyphens"
         )
 
+def require_database():
+    if lectures_collection is None or questions_collection is None:
+        logger.error("Database not initialized")
+        raise HTTPException(status_code=503, detail="Database not initialized")
+
 def check_memory_usage():
+    import psutil
     mem = psutil.virtual_memory()
-    logger.debug(f"Memory usage: {mem.percent}% (Total: {mem.total/1024/1024:.2f}MB, Available: {mem.available/1024/1024:.2f}MB)")
+    logger.debug("Memory usage: %s%% (Total: %.2fMB, Available: %.2fMB)", mem.percent, mem.total/1024/1024, mem.available/1024/1024)
     if mem.percent > 80:
         logger.error("Memory usage exceeds 80%")
         raise HTTPException(status_code=507, detail="Memory overloaded")
@@ -183,7 +520,7 @@ def cleanup_lecture_files(lecture_path: str):
     try:
         if lecture_path and os.path.exists(lecture_path):
             os.remove(lecture_path)
-            logger.debug(f"Removed lecture file: {lecture_path}")
+            logger.debug("Removed lecture file: %s", lecture_path)
     except Exception as e:
         logger.error(f"Cleanup failed: {str(e)}")
 
@@ -193,7 +530,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     errors = exc.errors()
     details = "; ".join([f"{err['loc'][-1]}: {err['msg']}" for err in errors])
     logger.error(f"Validation error: {details}")
-    return JSONResponse(
+    return APIResponse(
         status_code=422,
         content={"error": "Validation error", "details": details},
         headers=get_cors_headers()
@@ -202,7 +539,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP error {exc.status_code}: {exc.detail}")
-    return JSONResponse(
+    return APIResponse(
         status_code=exc.status_code,
         content={"error": exc.detail},
         headers=get_cors_headers()
@@ -211,7 +548,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(MemoryError)
 async def memory_error_handler(request: Request, exc: MemoryError):
     logger.error(f"Memory error: {str(exc)}")
-    return JSONResponse(
+    return APIResponse(
         status_code=507,
         content={"error": "Out of memory. Try a smaller file."},
         headers=get_cors_headers()
@@ -220,7 +557,7 @@ async def memory_error_handler(request: Request, exc: MemoryError):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return APIResponse(
         status_code=500,
         content={"error": "Internal server error"},
         headers=get_cors_headers()
@@ -258,6 +595,12 @@ class ExamRequest(BaseModel):
     exam_type: str
     difficulty: str
 
+class CourseExamRequest(BaseModel):
+    course_name: str
+    exam_type: str
+    difficulty: str
+    question_count: int = 20
+
 class AnswerSubmit(BaseModel):
     question_id: str
     answer: str
@@ -278,13 +621,14 @@ async def create_user(username: str, hashed_password: str):
     if users_collection is None:
         logger.error("Users collection not initialized")
         raise HTTPException(status_code=503, detail="Database not initialized")
+    from pymongo.errors import DuplicateKeyError
     try:
         validate_name(username, "Username")
         if await get_user(username):
             raise HTTPException(status_code=400, detail="Username exists")
         user = {"username": username, "hashed_password": hashed_password}
         await users_collection.insert_one(user)
-        logger.info(f"User {username} created")
+        logger.info("User %s created", username)
         return user
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Username exists")
@@ -303,16 +647,80 @@ async def get_user_courses(username: str) -> List[str]:
         logger.error(f"Error fetching courses for {username}: {str(e)}")
         raise HTTPException(status_code=500, detail="Could not fetch courses")
 
+async def course_exists(username: str, course_name: str) -> bool:
+    if courses_collection is None:
+        logger.error("Courses collection not initialized")
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    try:
+        return await courses_collection.find_one(
+            {"username": username, "course_name": course_name}, {"_id": 1}
+        ) is not None
+    except Exception as e:
+        logger.error(f"Error checking course {course_name} for {username}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Could not fetch courses")
+
+async def get_user_version(username: str) -> tuple:
+    """Return the user's (data_version, data_modified), bumped on every course/lecture change."""
+    if users_collection is None:
+        logger.error("Users collection not initialized")
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    try:
+        user = await users_collection.find_one(
+            {"username": username}, {"_id": 0, "data_version": 1, "data_modified": 1}
+        )
+        if not user:
+            return 0, None
+        return user.get("data_version", 0), user.get("data_modified")
+    except Exception as e:
+        logger.error(f"Error fetching version for {username}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Could not fetch user")
+
+async def bump_user_version(username: str):
+    try:
+        await users_collection.update_one(
+            {"username": username},
+            {
+                "$inc": {"data_version": 1},
+                # Second precision, matching what Last-Modified/If-Modified-Since can carry
+                "$set": {"data_modified": datetime.datetime.utcnow().replace(microsecond=0)}
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error bumping version for {username}: {str(e)}")
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        name = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not NAME_PATTERN.match(name):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return name
+
+async def paginate_names(collection, query: Dict, field: str, cursor: Optional[str], limit: int) -> tuple:
+    """Return one page of `field` values sorted ascending, plus the cursor for the next page."""
+    if cursor:
+        query = {**query, field: {"$gt": decode_cursor(cursor)}}
+    docs = await collection.find(query, {"_id": 0, field: 1}).sort(field, 1).limit(limit + 1).to_list(limit + 1)
+    names = [doc[field] for doc in docs[:limit]]
+    next_cursor = encode_cursor(names[-1]) if len(docs) > limit else None
+    return names, next_cursor
+
 async def create_course_db(username: str, course_name: str):
     if courses_collection is None:
         logger.error("Courses collection not initialized")
         raise HTTPException(status_code=503, detail="Database not initialized")
+    from pymongo.errors import DuplicateKeyError
     try:
         validate_name(course_name, "Course name")
         if await courses_collection.find_one({"username": username, "course_name": course_name}):
             raise HTTPException(status_code=400, detail="Course exists")
         await courses_collection.insert_one({"username": username, "course_name": course_name})
-        logger.info(f"Course {course_name} created for {username}")
+        await bump_user_version(username)
+        logger.info("Course %s created for %s", course_name, username)
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Course exists")
     except Exception as e:
@@ -324,29 +732,144 @@ async def get_user_lectures(username: str, course_name: str) -> List[Dict]:
         logger.error("Lectures collection not initialized")
         raise HTTPException(status_code=503, detail="Database not initialized")
     try:
-        lectures = await lectures_collection.find({"username": username, "course_name": course_name}).to_list(None)
+        lectures = await lectures_collection.find(
+            {"username": username, "course_name": course_name}, {"_id": 0, "lecture_name": 1, "file_path": 1}
+        ).to_list(None)
         return [{"name": lec["lecture_name"], "path": lec["file_path"]} for lec in lectures]
     except Exception as e:
         logger.error(f"Error fetching lectures for {username}/{course_name}: {str(e)}")
         raise HTTPException(status_code=500, detail="Could not fetch lectures")
 
-async def create_lecture_db(username: str, course_name: str, lecture_name: str, file_path: str, lecture_text: str):
+async def get_lecture(username: str, lecture_name: str) -> Optional[Dict]:
+    """The user's lecture by name, with its text decompressed."""
+    lecture = await lectures_collection.find_one({"username": username, "lecture_name": lecture_name})
+    return decompress_fields(lecture, LECTURE_TEXT_FIELDS)
+
+async def referenced_lecture_files(username: str) -> Optional[set]:
+    """File names under the user's lectures directory that a lecture still points at.
+
+    None (the reconciler then leaves the directory alone) when the user is
+    not in the database, e.g. when the app points at an empty or wrong one.
+    """
+    if lectures_collection is None or users_collection is None:
+        return None
+    if not await users_collection.find_one({"username": username}, {"_id": 1}):
+        logger.warning(f"Storage reconciliation: no user {username} in the database, skipping their files")
+        return None
+    lectures = await lectures_collection.find(
+        {"username": username}, {"_id": 0, "file_path": 1}
+    ).to_list(None)
+    return {os.path.basename(lec["file_path"]) for lec in lectures if lec.get("file_path")}
+
+# Removes stale upload temp files and PDFs no lecture references (see storage_reconciler)
+storage_reconciler = StorageReconciler(USER_DATA_DIR, referenced_lecture_files, RECLAIM_LOCK_PATH)
+
+def build_lecture_doc(
+    username: str, course_name: str, lecture_name: str, file_path: str, lecture_text: str,
+    page_offsets: Optional[List[int]] = None, content_hash: Optional[str] = None
+) -> Dict:
+    lecture = {
+        "username": username,
+        "course_name": course_name,
+        "lecture_name": lecture_name,
+        "file_path": file_path,
+        "lecture_text": lecture_text[:MAX_TEXT_LENGTH]  # Truncate text
+    }
+    if page_offsets:
+        # Start of each page in the stored lecture_text, for page numbers in search snippets
+        lecture["page_offsets"] = [offset for offset in page_offsets if offset < MAX_TEXT_LENGTH]
+    if content_hash:
+        lecture["content_hash"] = content_hash  # sha256 of the PDF file
+    return lecture
+
+async def index_lecture(lecture: Dict, text: Optional[str] = None, page_offsets: Optional[List[int]] = None):
+    """Add a lecture to its owner's inverted index: one posting per distinct term.
+
+    text/page_offsets are the lecture's full extracted text; lecture_text is
+    truncated to MAX_TEXT_LENGTH for prompts and is only indexed without them.
+    """
+    username, course_name, lecture_name = lecture["username"], lecture["course_name"], lecture["lecture_name"]
+    if text is None:
+        text, page_offsets = lecture["lecture_text"], lecture.get("page_offsets")
+    length, terms = await asyncio.to_thread(search_index.analyze, text, page_offsets)
+    postings = [
+        {
+            "username": username,
+            "term": term,
+            "course_name": course_name,
+            "lecture_name": lecture_name,
+            "tf": tf,
+            "dl": length,
+            "pages": pages
+        }
+        for term, (tf, pages) in terms.items()
+    ]
+    key = {"username": username, "course_name": course_name, "lecture_name": lecture_name}
+    counted = False
+    try:
+        if postings:
+            await search_postings_collection.insert_many(postings, ordered=False)
+        await search_stats_collection.update_one(
+            {"username": username}, {"$inc": {"doc_count": 1, "total_length": length}}, upsert=True
+        )
+        counted = True
+        # Written last: a search_docs entry means the lecture is fully indexed
+        await search_docs_collection.update_one(key, {"$set": {"length": length}}, upsert=True)
+    except Exception:
+        # Undo the partial entry so the lecture can be indexed again from scratch
+        await search_postings_collection.delete_many(key)
+        if counted:
+            await search_stats_collection.update_one(
+                {"username": username}, {"$inc": {"doc_count": -1, "total_length": -length}}
+            )
+        raise
+    logger.debug("Indexed %s terms for %s/%s/%s", len(postings), username, course_name, lecture_name)
+
+async def defer_indexing(username: str, course_name: str, lecture_name: str):
+    """Flag a lecture whose indexing failed for reindex_pending_lectures at the next startup."""
+    key = {"username": username, "course_name": course_name, "lecture_name": lecture_name}
+    try:
+        await lectures_collection.update_one(key, {"$set": {"search_pending": True}})
+    except Exception as e:
+        logger.error(f"Could not flag {username}/{course_name}/{lecture_name} for reindexing: {str(e)}")
+
+async def unindex_lecture(username: str, course_name: str, lecture_name: str):
+    """Remove a lecture from the index; safe to retry after a partial failure."""
+    key = {"username": username, "course_name": course_name, "lecture_name": lecture_name}
+    indexed = await search_docs_collection.find_one(key, {"_id": 0, "length": 1})
+    await search_postings_collection.delete_many(key)
+    if not indexed:
+        return
+    # Only the call that removes the search_docs entry adjusts the stats, so retries never count twice
+    deleted = await search_docs_collection.delete_one(key)
+    if deleted.deleted_count:
+        await search_stats_collection.update_one(
+            {"username": username}, {"$inc": {"doc_count": -1, "total_length": -indexed["length"]}}
+        )
+
+async def create_lecture_db(
+    username: str, course_name: str, lecture_name: str, file_path: str, lecture_text: str,
+    page_offsets: Optional[List[int]] = None, content_hash: Optional[str] = None
+):
     if lectures_collection is None:
         logger.error("Lectures collection not initialized")
         raise HTTPException(status_code=503, detail="Database not initialized")
+    from pymongo.errors import DuplicateKeyError
     try:
         validate_name(lecture_name, "Lecture name")
         if await lectures_collection.find_one({"username": username, "course_name": course_name, "lecture_name": lecture_name}):
             raise HTTPException(status_code=400, detail="Lecture exists")
-        lecture = {
-            "username": username,
-            "course_name": course_name,
-            "lecture_name": lecture_name,
-            "file_path": file_path,
-            "lecture_text": lecture_text[:MAX_TEXT_LENGTH]  # Truncate text
-        }
-        await lectures_collection.insert_one(lecture)
-        logger.info(f"Lecture {lecture_name} created for {username}/{course_name}")
+        lecture = build_lecture_doc(username, course_name, lecture_name, file_path, lecture_text, page_offsets, content_hash)
+        await lectures_collection.insert_one(compress_fields(lecture, LECTURE_TEXT_FIELDS))
+        with span("search.index"):
+            try:
+                await index_lecture(lecture, lecture_text, page_offsets)
+            except Exception as e:
+                # The lecture and its PDF are saved; search catches up at the next startup
+                logger.error(f"Indexing lecture {lecture_name} failed: {str(e)}")
+                await defer_indexing(username, course_name, lecture_name)
+        await bump_user_version(username)
+        logger.info("Lecture %s created for %s/%s", lecture_name, username, course_name)
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Lecture exists")
     except Exception as e:
@@ -383,7 +906,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid credentials")
-        logger.debug(f"Authenticated user: {username}")
+        logger.debug("Authenticated user: %s", username)
         return username
     except jwt.PyJWTError as e:
         logger.error(f"JWT error: {str(e)}")
@@ -391,7 +914,9 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
 
 # File processing
 def validate_pdf(file_path: str) -> None:
-    logger.debug(f"Validating PDF: {file_path}")
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PdfReadError
+    logger.debug("Validating PDF: %s", file_path)
     try:
         with open(file_path, 'rb') as f:
             reader = PdfReader(f)
@@ -404,6 +929,8 @@ def validate_pdf(file_path: str) -> None:
             text = reader.pages[0].extract_text() or ""
             if not text.strip():
                 raise HTTPException(status_code=400, detail="PDF has no extractable text")
+    except HTTPException:
+        raise
     except PdfReadError:
         logger.error("Invalid PDF file")
         raise HTTPException(status_code=400, detail="Invalid PDF")
@@ -411,29 +938,52 @@ def validate_pdf(file_path: str) -> None:
         logger.error(f"PDF validation error: {str(e)}")
         raise HTTPException(status_code=500, detail="PDF validation failed")
 
-async def extract_text_from_pdf(file_path: str, timeout: int = 60) -> str:
-    logger.debug(f"Extracting text from PDF: {file_path}")
+def read_pdf_pages(file_path: str, cancel: Optional[threading.Event] = None) -> List[str]:
+    """Extract the text of each page (up to MAX_PDF_PAGES); blocking, run it off the event loop.
+
+    Threads cannot be interrupted, so a caller that gives up sets `cancel` and
+    extraction stops before the next page.
+    """
+    from PyPDF2 import PdfReader
+    text = []
+    with open(file_path, 'rb') as f:
+        reader = PdfReader(f)
+        total_pages = min(len(reader.pages), MAX_PDF_PAGES)
+        logger.debug("PDF has %s pages", total_pages)
+        for page_num in range(total_pages):
+            if cancel is not None and cancel.is_set():
+                logger.debug("PDF extraction cancelled after %s pages", page_num)
+                break
+            try:
+                check_memory_usage()
+                page_text = reader.pages[page_num].extract_text() or ""
+                text.append(page_text)
+                logger.debug("Extracted text from page %s (length: %s)", page_num + 1, len(page_text))
+            except Exception as e:
+                logger.warning(f"Page {page_num + 1} extraction failed: {str(e)}")
+                text.append("")
+    return text
+
+async def extract_text_from_pdf(file_path: str, timeout: int = 60) -> tuple:
+    """Return (full text, page start offsets in it); build_lecture_doc truncates what is stored."""
+    logger.debug("Extracting text from PDF: %s", file_path)
     try:
-        await asyncio.wait_for(asyncio.to_thread(validate_pdf, file_path), timeout=30)
-        text = []
-        with open(file_path, 'rb') as f:
-            reader = PdfReader(f)
-            total_pages = min(len(reader.pages), MAX_PDF_PAGES)
-            logger.debug(f"PDF has {total_pages} pages")
-            for page_num in range(total_pages):
-                try:
-                    check_memory_usage()
-                    page_text = reader.pages[page_num].extract_text() or ""
-                    text.append(page_text)
-                    logger.debug(f"Extracted text from page {page_num + 1} (length: {len(page_text)})")
-                except Exception as e:
-                    logger.warning(f"Page {page_num + 1} extraction failed: {str(e)}")
-                    text.append("")
+        with span("pdf.validate"):
+            await asyncio.wait_for(asyncio.to_thread(validate_pdf, file_path), timeout=30)
+        cancel = threading.Event()
+        with span("pdf.extract") as extract_span:
+            try:
+                text = await asyncio.wait_for(asyncio.to_thread(read_pdf_pages, file_path, cancel), timeout=timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                cancel.set()
+                raise
+            if extract_span:
+                extract_span.set_tag("pages", len(text))
         full_text = "\n".join(text)
         if not full_text.strip():
             raise HTTPException(status_code=400, detail="No extractable text in PDF")
-        logger.debug(f"Total extracted text length: {len(full_text)}")
-        return full_text[:MAX_TEXT_LENGTH]  # Truncate text
+        logger.debug("Total extracted text length: %s", len(full_text))
+        return full_text, search_index.page_offsets(text)
     except asyncio.TimeoutError:
         logger.error("PDF validation timed out")
         raise HTTPException(status_code=504, detail="PDF validation timed out")
@@ -444,16 +994,34 @@ async def extract_text_from_pdf(file_path: str, timeout: int = 60) -> str:
         raise HTTPException(status_code=500, detail="PDF processing failed")
 
 # Prompt templates
-EXAM_PROMPT = PromptTemplate(
-    input_variables=["text", "level", "exam_type"],
-    template="""
-    Based on the following lecture content:
-    {text}
+class LazyPrompt:
+    """Stands in for a LangChain PromptTemplate, importing LangChain on first format()."""
+
+    def __init__(self, input_variables: List[str], template: str):
+        self.input_variables = input_variables
+        self.template = template
+        self._prompt = None
+
+    def format(self, **kwargs) -> str:
+        if self._prompt is None:
+            from langchain_core.prompts import PromptTemplate
+            self._prompt = PromptTemplate(input_variables=self.input_variables, template=self.template)
+        return self._prompt.format(**kwargs)
+
+# Every lecture prompt starts with exactly these bytes, lecture text first, so
+# the provider's prompt cache can reuse the prefix across tasks on one lecture.
+LECTURE_PREFIX = """Based on the following lecture content:
+{text}
+"""
+
+EXAM_PROMPT = LazyPrompt(
+    input_variables=["text", "level", "exam_type", "question_count"],
+    template=LECTURE_PREFIX + """
     Create an exam with the specified parameters.
     Difficulty level: {level}
     Exam type: {exam_type}
     If Exam type is "MCQs":
-    Generate 10 Multiple Choice Questions (MCQs) with options A-D.
+    Generate {question_count} Multiple Choice Questions (MCQs) with options A-D.
     Format:
     **MCQs**
     1. [Question]?
@@ -463,14 +1031,14 @@ EXAM_PROMPT = PromptTemplate(
     D) [Option4]
     Answer: [Letter]
     If Exam type is "Essay Questions":
-    Generate 10 Essay Questions.
+    Generate {question_count} Essay Questions.
     Format:
     **Essay Questions**
     1. [Essay Question]
     """
 )
 
-GRADING_PROMPT = PromptTemplate(
+GRADING_PROMPT = LazyPrompt(
     input_variables=["question", "answer", "correct_answer"],
     template="""
     You are a helpful and educational Student Assistant.
@@ -486,134 +1054,249 @@ GRADING_PROMPT = PromptTemplate(
 )
 
 STUDY_PROMPTS = {
-    "Summarize": PromptTemplate(
+    "Summarize": LazyPrompt(
         input_variables=["text"],
-        template="""
-        Based on the following lecture content:
-        {text}
+        template=LECTURE_PREFIX + """
         Create a comprehensive summary.
         Include all key concepts and important points.
         Use clear examples to explain difficult concepts.
         Provide the summary in a well-structured format with headings, bullet points, and examples.
         """
     ),
-    "Explain": PromptTemplate(
+    "Explain": LazyPrompt(
         input_variables=["text"],
-        template="""
-        Based on the following lecture content:
-        {text}
+        template=LECTURE_PREFIX + """
         Explain the content in detail. Break down all complex concepts
         and provide simple explanations with examples.
         Your explanation should be easy to understand for a student. Use analogies and examples
         where appropriate to clarify difficult concepts.
         """
     ),
-    "Examples": PromptTemplate(
+    "Examples": LazyPrompt(
         input_variables=["text"],
-        template="""
-        Based on the following lecture content:
-        {text}
+        template=LECTURE_PREFIX + """
         Create practical examples.
         Provide at least 5 different examples that illustrate the concepts.
         Each example should demonstrate a different aspect of the material.
         """
     ),
-    "Custom Question": PromptTemplate(
+    "Custom Question": LazyPrompt(
         input_variables=["text", "question"],
-        template="""
-        Based on the following lecture content:
-        {text}
+        template=LECTURE_PREFIX + """
         Answer this specific question:
         {question}
         Provide a thorough answer with examples and explanations.
         """
+    ),
+    "Study Pack": LazyPrompt(
+        input_variables=["text"],
+        template=LECTURE_PREFIX + """
+        Create a study pack with the three sections below, in this order.
+        Start each section with its marker line exactly as written and write nothing before the first marker.
+        === Summarize ===
+        A comprehensive summary of all key concepts and important points,
+        well structured with headings, bullet points, and examples.
+        === Explain ===
+        A detailed explanation that breaks down all complex concepts into simple terms,
+        with analogies and examples that are easy to understand for a student.
+        === Examples ===
+        At least 5 practical examples, each demonstrating a different aspect of the material.
+        """
     )
 }
 
+# Tasks a "Study Pack" completion covers, in the order of its sections
+STUDY_PACK_TASKS = ("Summarize", "Explain", "Examples")
+STUDY_PACK_MARKER = re.compile(r"^[#*\s]*===\s*(Summarize|Explain|Examples)\s*===[#*\s]*$", re.MULTILINE)
+
+def split_study_pack(text: str) -> Dict[str, str]:
+    """Split a Study Pack completion into {task: section text} at its marker lines."""
+    markers = list(STUDY_PACK_MARKER.finditer(text))
+    sections = {}
+    for idx, marker in enumerate(markers):
+        end = markers[idx + 1].start() if idx + 1 < len(markers) else len(text)
+        section = text[marker.end():end].strip()
+        if section:
+            sections[marker.group(1)] = section
+    return sections
+
+def study_pack_content(sections: Dict[str, str]) -> Dict:
+    return {
+        "content": "\n\n".join(f"## {task}\n\n{sections[task]}" for task in STUDY_PACK_TASKS if task in sections),
+        "sections": sections
+    }
+
+async def get_cached_study_content(text_hash: str, tasks) -> Dict[str, str]:
+    """Cached Summarize/Explain/Examples content for a lecture text, keyed by its sha256."""
+    try:
+        docs = await study_cache_collection.find(
+            {"text_hash": text_hash, "task": {"$in": list(tasks)}}, {"_id": 0, "task": 1, "content": 1}
+        ).to_list(None)
+        return {doc["task"]: decompress_text(doc["content"]) for doc in docs}
+    except Exception as e:
+        logger.warning(f"Study cache lookup failed: {str(e)}")
+        return {}
+
+async def cache_study_content(text_hash: str, sections: Dict[str, str]):
+    try:
+        for task, content in sections.items():
+            await study_cache_collection.update_one(
+                {"text_hash": text_hash, "task": task},
+                {"$set": {"content": compress_text(content), "created_at": datetime.datetime.utcnow()}},
+                upsert=True
+            )
+    except Exception as e:
+        logger.warning(f"Study cache store failed: {str(e)}")
+
+def exam_max_tokens(question_count: int) -> int:
+    """Completion budget for an EXAM_PROMPT asking for question_count questions."""
+    return 64 + question_count * EXAM_TOKENS_PER_QUESTION
+
+def parse_exam_questions(exam_text: str, exam_type: str, lecture_name: str) -> List[Dict]:
+    """Turn an EXAM_PROMPT completion into question documents (not yet stored)."""
+    mcqs = []
+    essays = []
+    lines = exam_text.replace('\r\n', '\n').strip().split('\n')
+    current_section = None
+    current_question = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('**MCQs**'):
+            current_section = 'mcqs'
+            continue
+        elif line.startswith('**Essay Questions**'):
+            if current_question:
+                if current_section == 'mcqs':
+                    mcqs.append('\n'.join(current_question))
+                current_question = []
+            current_section = 'essays'
+            continue
+        if current_section == 'mcqs':
+            if re.match(r"^\d+\.\s", line):
+                if current_question:
+                    mcqs.append('\n'.join(current_question))
+                    current_question = []
+                current_question.append(line)
+            elif line.startswith(('A)', 'B)', 'C)', 'D)', 'Answer:')):
+                current_question.append(line)
+        elif current_section == 'essays':
+            if re.match(r"^\d+\.\s", line):
+                if current_question:
+                    essays.append('\n'.join(current_question))
+                    current_question = []
+                current_question.append(line)
+    if current_question:
+        if current_section == 'mcqs':
+            mcqs.append('\n'.join(current_question))
+        elif current_section == 'essays':
+            essays.append('\n'.join(current_question))
+    flattened = []
+    if exam_type == "MCQs":
+        for idx, q in enumerate(mcqs):
+            lines = q.split('\n')
+            question_text = next((line for line in lines if re.match(r"^\d+\.\s", line)), "")
+            options = [line for line in lines if re.match(r"^[A-D]\)", line)]
+            answer_line = next((line for line in lines if line.startswith("Answer:")), "")
+            answer = answer_line.replace("Answer:", "").strip() if answer_line else ""
+            if not options or not answer:
+                # Cut off by the token limit (or malformed): not answerable, so not usable
+                logger.debug("Dropping incomplete MCQ for %s: %r", lecture_name, question_text)
+                continue
+            question_id = f"mcq_{lecture_name}_{idx}"
+            question = {
+                "id": question_id,
+                "lecture_name": lecture_name,
+                "question": question_text,
+                "type": "mcq",
+                "options": options,
+                "correct_answer": answer
+            }
+            flattened.append(question)
+    elif exam_type == "Essay Questions":
+        for idx, q in enumerate(essays):
+            question_id = f"essay_{lecture_name}_{idx}"
+            question = {
+                "id": question_id,
+                "lecture_name": lecture_name,
+                "question": q,
+                "type": "essay",
+                "options": [],
+                "correct_answer": ""
+            }
+            flattened.append(question)
+    return flattened
+
+async def save_questions(questions: List[Dict]):
+    for question in questions:
+        await questions_collection.update_one({"id": question["id"]}, {"$set": question}, upsert=True)
+
 async def parse_exam(exam_text: str, exam_type: str, lecture_name: str) -> List[Dict]:
     if questions_collection is None:
         logger.error("Questions collection not initialized")
         raise HTTPException(status_code=503, detail="Database not initialized")
     try:
-        mcqs = []
-        essays = []
-        lines = exam_text.replace('\r\n', '\n').strip().split('\n')
-        current_section = None
-        current_question = []
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('**MCQs**'):
-                current_section = 'mcqs'
-                continue
-            elif line.startswith('**Essay Questions**'):
-                if current_question:
-                    if current_section == 'mcqs':
-                        mcqs.append('\n'.join(current_question))
-                    current_question = []
-                current_section = 'essays'
-                continue
-            if current_section == 'mcqs':
-                if re.match(r"^\d+\.\s", line):
-                    if current_question:
-                        mcqs.append('\n'.join(current_question))
-                        current_question = []
-                    current_question.append(line)
-                elif line.startswith(('A)', 'B)', 'C)', 'D)', 'Answer:')):
-                    current_question.append(line)
-            elif current_section == 'essays':
-                if re.match(r"^\d+\.\s", line):
-                    if current_question:
-                        essays.append('\n'.join(current_question))
-                        current_question = []
-                    current_question.append(line)
-        if current_question:
-            if current_section == 'mcqs':
-                mcqs.append('\n'.join(current_question))
-            elif current_section == 'essays':
-                essays.append('\n'.join(current_question))
-        flattened = []
-        if exam_type == "MCQs":
-            for idx, q in enumerate(mcqs):
-                lines = q.split('\n')
-                question_text = next((line for line in lines if re.match(r"^\d+\.\s", line)), "")
-                options = [line for line in lines if re.match(r"^[A-D]\)", line)]
-                answer_line = next((line for line in lines if line.startswith("Answer:")), "")
-                answer = answer_line.replace("Answer:", "").strip() if answer_line else ""
-                question_id = f"mcq_{lecture_name}_{idx}"
-                question = {
-                    "id": question_id,
-                    "lecture_name": lecture_name,
-                    "question": question_text,
-                    "type": "mcq",
-                    "options": options,
-                    "correct_answer": answer
-                }
-                flattened.append(question)
-                await questions_collection.update_one({"id": question_id}, {"$set": question}, upsert=True)
-        elif exam_type == "Essay Questions":
-            for idx, q in enumerate(essays):
-                question_id = f"essay_{lecture_name}_{idx}"
-                question = {
-                    "id": question_id,
-                    "lecture_name": lecture_name,
-                    "question": q,
-                    "type": "essay",
-                    "options": [],
-                    "correct_answer": ""
-                }
-                flattened.append(question)
-                await questions_collection.update_one({"id": question_id}, {"$set": question}, upsert=True)
-        logger.info(f"Parsed {len(flattened)} questions for {lecture_name}")
-        return flattened
+        questions = parse_exam_questions(exam_text, exam_type, lecture_name)
+        await save_questions(questions)
+        logger.info("Parsed %s questions for %s", len(questions), lecture_name)
+        return questions
     except Exception as e:
         logger.error(f"Exam parsing error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not parse exam")
 
+def question_fingerprint(question: Dict) -> frozenset:
+    """Content words of a question, ignoring its number and the option letters."""
+    text = re.sub(r"^\d+\.\s*", "", question["question"]).lower()
+    return frozenset(term for term in re.findall(r"[a-z0-9]+", text) if term not in search_index.STOPWORDS)
+
+def is_duplicate_question(fingerprint: frozenset, seen: List[frozenset], threshold: float = 0.8) -> bool:
+    for other in seen:
+        union = len(fingerprint | other)
+        if union and len(fingerprint & other) / union >= threshold:
+            return True
+    return False
+
+def allocate_questions(lengths: Dict[str, int], total: int, per_lecture_max: int = EXAM_QUESTIONS_PER_LECTURE) -> Dict[str, int]:
+    """Split total questions across lectures in proportion to their text length (largest remainder).
+
+    Lectures whose share reaches per_lecture_max are capped and the rest is
+    re-split among the others, so the total is only cut short when every
+    lecture is at the cap.
+    """
+    counts, uncapped, remaining = {}, dict(lengths), total
+    while uncapped and remaining > 0:
+        weight = sum(uncapped.values())
+        if not weight:
+            break
+        quotas = {name: remaining * length / weight for name, length in uncapped.items()}
+        capped = [name for name, quota in quotas.items() if quota >= per_lecture_max]
+        if not capped:
+            # Every quota is below the cap, so rounding up by one never exceeds it
+            for name, quota in quotas.items():
+                counts[name] = int(quota)
+            remaining -= sum(int(quota) for quota in quotas.values())
+            for name in sorted(quotas, key=lambda n: quotas[n] - int(quotas[n]), reverse=True)[:remaining]:
+                counts[name] += 1
+            break
+        for name in capped:
+            counts[name] = per_lecture_max
+            remaining -= per_lecture_max
+            del uncapped[name]
+    return {name: count for name, count in counts.items() if count}
+
 # Initialize ChatGroq
-def get_chat_model():
+def get_chat_model(model_name: str = LLM_MODELS[0]):
+    global _chat_models, _chat_models_pid
+    if _chat_models_pid != os.getpid():
+        # Never reuse clients (and their connection pools) inherited across a fork
+        _chat_models = {}
+        _chat_models_pid = os.getpid()
+    if model_name in _chat_models:
+        return _chat_models[model_name]
+    from groq import Groq, APIError
+    from langchain_groq import ChatGroq
     try:
         if not GROQ_API_KEY:
             logger.error("GROQ_API_KEY not set in environment")
@@ -625,17 +1308,17 @@ def get_chat_model():
             logger.error(f"Invalid GROQ_API_KEY format: {stripped_key[:5]}...")
             raise HTTPException(status_code=500, detail="Invalid GROQ_API_KEY format")
         
-        logger.debug(f"Attempting to use GROQ_API_KEY: {stripped_key[:5]}...{stripped_key[-5:]}")
+        logger.debug("Attempting to use GROQ_API_KEY: %s...%s", stripped_key[:5], stripped_key[-5:])
         
         # Test API key with minimal request
-        client = Groq(api_key=stripped_key)
+        client = Groq(api_key=stripped_key, base_url=GROQ_BASE_URL)
         try:
             response = client.chat.completions.create(
-                model="llama3-70b-8192",
+                model=model_name,
                 messages=[{"role": "user", "content": "Test"}],
                 max_tokens=10
             )
-            logger.info(f"GROQ_API_KEY validated successfully: {response.id}")
+            logger.info("GROQ_API_KEY validated successfully: %s", response.id)
         except APIError as e:
             logger.error(f"GROQ_API_KEY validation failed: {str(e)}. Response: {getattr(e, 'response', 'No response')}")
             raise HTTPException(status_code=503, detail=f"Invalid GROQ_API_KEY: {str(e)}")
@@ -649,10 +1332,12 @@ def get_chat_model():
         chat_model = ChatGroq(
             temperature=0.7,
             groq_api_key=stripped_key,
-            model_name="llama3-70b-8192",
+            model_name=model_name,
+            base_url=GROQ_BASE_URL,
             max_tokens=256
         )
-        logger.debug("ChatGroq initialized successfully")
+        _chat_models[model_name] = chat_model
+        logger.debug("ChatGroq %s initialized successfully (worker %s)", model_name, os.getpid())
         return chat_model
     except APIError as e:
         logger.error(f"ChatGroq API error: {str(e)}. Response: {getattr(e, 'response', 'No response')}")
@@ -661,6 +1346,101 @@ def get_chat_model():
         logger.error(f"Failed to initialize ChatGroq: {str(e)}", exc_info=True)
         raise HTTPException(status_code=503, detail="AI service unavailable")
 
+class AIServiceError(Exception):
+    """Error reported by the Groq API (wraps groq.APIError so callers need not import groq)."""
+
+async def invoke_model(model_name: str, prompt_text: str, max_tokens: Optional[int] = None):
+    chat_model = _chat_models.get(model_name) if _chat_models_pid == os.getpid() else None
+    if chat_model is None:
+        # First use in this worker validates the key with a blocking request
+        with span("llm.init", model=model_name):
+            chat_model = await asyncio.to_thread(get_chat_model, model_name)
+    try:
+        # Async client so hedged or abandoned calls can be cancelled
+        if max_tokens:
+            chat_model = chat_model.bind(max_tokens=max_tokens)
+        with span("llm.model", model=model_name, prompt_chars=len(prompt_text)):
+            return await chat_model.ainvoke(prompt_text)
+    except Exception as e:
+        from groq import APIError
+        if isinstance(e, APIError):
+            raise AIServiceError(str(e)) from e
+        raise
+
+model_router = ModelRouter(invoke_model)
+llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+async def invoke_chat_model(
+    prompt_text: str, task: str = "default", timeout: float = LLM_TIMEOUT_SECONDS, max_tokens: Optional[int] = None,
+    with_fallback_flag: bool = False
+):
+    """The completion for prompt_text; with with_fallback_flag, (completion, served by a fallback model)."""
+    async with llm_slots:
+        with span("llm.complete", task=task) as llm_span:
+            response, model_name = await model_router.complete(
+                prompt_text, prefer_fast=task in LLM_FAST_TASKS, timeout=timeout, max_tokens=max_tokens
+            )
+            if llm_span:
+                llm_span.set_tag("model", model_name)
+    logger.debug("Completion for %s served by %s", task, model_name)
+    if with_fallback_flag:
+        return response, model_name != model_router.preference(task in LLM_FAST_TASKS)[0]
+    return response
+
+async def cancel_on_disconnect(request: Request, awaitable, kind: str):
+    """Await `awaitable`, cancelling it as soon as the client has gone away.
+
+    Uvicorn keeps running a handler after its client disconnects, so long
+    LLM calls and extractions poll for it. Abandoned work is counted in
+    cancelled_work[kind] and the handler ends with a 499.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                # Let the task run its cancellation cleanup before the handler returns
+                await asyncio.gather(task, return_exceptions=True)
+                cancelled_work[kind] += 1
+                logger.info("Client disconnected from %s; cancelled %s work", request.url.path, kind)
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
+
+# Conditional GET support for listings
+def listing_etag(username: str, scope: str, version: int, cursor: Optional[str], limit: int) -> str:
+    digest = hashlib.sha1(f"{username}:{scope}:{version}:{cursor}:{limit}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime.datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag[2:] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
+
+async def check_listing_cache(request: Request, username: str, scope: str, cursor: Optional[str], limit: int) -> tuple:
+    """Return (304 response or None, caching headers) using only the user's change version."""
+    version, modified = await get_user_version(username)
+    etag = listing_etag(username, scope, version, cursor, limit)
+    headers = {**get_cors_headers(), "ETag": etag, "Cache-Control": "private, no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.replace(tzinfo=datetime.timezone.utc), usegmt=True)
+    if is_not_modified(request, etag, modified):
+        logger.debug("Listing %s not modified for %s", scope, username)
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
 # API Endpoints
 @app.post("/register", response_model=dict)
 async def register(credentials: UserCredentials):
@@ -673,8 +1453,8 @@ async def register(credentials: UserCredentials):
             data={"sub": credentials.username},
             expires_delta=datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
-        logger.info(f"User {credentials.username} registered successfully")
-        return JSONResponse(
+        logger.info("User %s registered successfully", credentials.username)
+        return APIResponse(
             content={"message": "Registered successfully", "token": access_token},
             headers=get_cors_headers()
         )
@@ -696,8 +1476,8 @@ async def login(credentials: UserCredentials):
             data={"sub": credentials.username},
             expires_delta=datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
-        logger.info(f"User {credentials.username} logged in successfully")
-        return JSONResponse(
+        logger.info("User %s logged in successfully", credentials.username)
+        return APIResponse(
             content={"token": access_token},
             headers=get_cors_headers()
         )
@@ -718,8 +1498,8 @@ async def get_profile(username: str = Depends(get_current_user)):
                 "course_name": course_name,
                 "lectures": [lec["name"] for lec in lectures]
             })
-        logger.info(f"Profile retrieved for {username}")
-        return JSONResponse(
+        logger.info("Profile retrieved for %s", username)
+        return APIResponse(
             content={"profile": profile},
             headers=get_cors_headers()
         )
@@ -731,8 +1511,8 @@ async def get_profile(username: str = Depends(get_current_user)):
 async def create_course(course: CourseCreate, username: str = Depends(get_current_user)):
     try:
         await create_course_db(username, course.course_name)
-        logger.info(f"Course {course.course_name} created for {username}")
-        return JSONResponse(
+        logger.info("Course %s created for %s", course.course_name, username)
+        return APIResponse(
             content={"message": f"Course '{course.course_name}' created"},
             headers=get_cors_headers()
         )
@@ -743,30 +1523,44 @@ async def create_course(course: CourseCreate, username: str = Depends(get_curren
         raise HTTPException(status_code=500, detail="Could not create course")
 
 @app.get("/courses", response_model=dict)
-async def list_courses(username: str = Depends(get_current_user)):
+async def list_courses(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    username: str = Depends(get_current_user)
+):
     try:
-        courses = await get_user_courses(username)
-        logger.info(f"Courses retrieved for {username}")
-        return JSONResponse(
-            content={"courses": courses},
-            headers=get_cors_headers()
+        not_modified, headers = await check_listing_cache(request, username, "courses", cursor, limit)
+        if not_modified:
+            return not_modified
+        courses, next_cursor = await paginate_names(
+            courses_collection, {"username": username}, "course_name", cursor, limit
+        )
+        logger.info("Courses retrieved for %s", username)
+        return APIResponse(
+            content={"courses": courses, "next_cursor": next_cursor},
+            headers=headers
         )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Courses retrieval error for {username}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not retrieve courses")
 
 @app.post("/lectures", response_model=dict)
 async def upload_lecture(
+    request: Request,
     lecture_name: str = Form(...),
     course_name: str = Form(...),
     file: UploadFile = File(...),
     username: str = Depends(get_current_user)
 ):
-    logger.info(f"Upload request: lecture={lecture_name}, course={course_name}, file={file.filename}, size={file.size}")
+    logger.info("Upload request: lecture=%s, course=%s, file=%s, size=%s", lecture_name, course_name, file.filename, file.size)
     lecture_path = os.path.join(USER_DATA_DIR, username, "lectures", f"{lecture_name}.pdf")
     temp_file_path = None
 
     try:
+        require_database()
         check_memory_usage()
         check_disk_space()
         if not check_volume_writable():
@@ -783,35 +1577,52 @@ async def upload_lecture(
         if file_size == 0:
             raise HTTPException(status_code=400, detail="Empty file")
 
-        courses = await get_user_courses(username)
-        if course_name not in courses:
-            raise HTTPException(status_code=404, detail="Course not found")
+        with span("mongo.check_lecture"):
+            if not await course_exists(username, course_name):
+                raise HTTPException(status_code=404, detail="Course not found")
 
-        if await lectures_collection.find_one({"username": username, "course_name": course_name, "lecture_name": lecture_name}):
-            raise HTTPException(status_code=400, detail="Lecture exists")
+            if await lectures_collection.find_one({"username": username, "course_name": course_name, "lecture_name": lecture_name}):
+                raise HTTPException(status_code=400, detail="Lecture exists")
 
         os.makedirs(os.path.dirname(lecture_path), exist_ok=True)
-        with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(lecture_path), suffix=".pdf") as temp_file:
+        # Inspect the bytes as they are written so non-PDF documents are
+        # rejected before the rest is copied and parsed
+        inspector = PdfStreamInspector()
+        with span("upload.receive") as receive_span, tempfile.NamedTemporaryFile(
+            delete=False, dir=os.path.dirname(lecture_path), suffix=".pdf", buffering=UPLOAD_CHUNK_SIZE
+        ) as temp_file:
             temp_file_path = temp_file.name
-            logger.debug(f"Saving temp PDF: {temp_file_path}")
-            async with aiofiles.open(temp_file_path, 'wb') as f:
-                total_bytes = 0
-                while chunk := await file.read(8192):
-                    total_bytes += len(chunk)
-                    if total_bytes > MAX_FILE_SIZE:
-                        raise HTTPException(status_code=413, detail=f"File too large. Max: {MAX_FILE_SIZE/1024/1024}MB")
-                    await f.write(chunk)
+            logger.debug("Saving temp PDF: %s", temp_file_path)
+
+            def store_chunk(chunk: bytes):
+                inspector.feed(chunk)
+                temp_file.write(chunk)
 
-        lecture_text = await extract_text_from_pdf(temp_file_path)
+            try:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    if inspector.size + len(chunk) > MAX_FILE_SIZE:
+                        raise HTTPException(status_code=413, detail=f"File too large. Max: {MAX_FILE_SIZE/1024/1024}MB")
+                    await asyncio.to_thread(store_chunk, chunk)
+                inspector.finish()
+            except InvalidPdfUpload as e:
+                logger.warning(f"Upload rejected after {inspector.size} bytes: {str(e)}")
+                raise HTTPException(status_code=400, detail=str(e))
+            if receive_span:
+                receive_span.set_tag("bytes", inspector.size)
+
+        lecture_text, page_offsets = await cancel_on_disconnect(request, extract_text_from_pdf(temp_file_path), "extraction")
         os.rename(temp_file_path, lecture_path)
-        logger.debug(f"Renamed temp file to: {lecture_path}")
-        await create_lecture_db(username, course_name, lecture_name, lecture_path, lecture_text)
-        logger.info(f"Lecture '{lecture_name}' uploaded successfully for {username}/{course_name}")
-        response = JSONResponse(
+        logger.debug("Renamed temp file to: %s", lecture_path)
+        with span("mongo.insert_lecture"):
+            await create_lecture_db(
+                username, course_name, lecture_name, lecture_path, lecture_text, page_offsets, inspector.sha256
+            )
+        logger.info("Lecture '%s' uploaded successfully for %s/%s", lecture_name, username, course_name)
+        response = APIResponse(
             content={"message": f"Lecture '{lecture_name}' uploaded"},
             headers=get_cors_headers()
         )
-        logger.debug(f"Response headers: {response.headers}")
+        logger.debug("Response headers: %s", response.headers)
         return response
     except HTTPException as he:
         if temp_file_path and os.path.exists(temp_file_path):
@@ -834,26 +1645,138 @@ async def upload_lecture(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/lectures/{course_name}", response_model=dict)
-async def list_lectures(course_name: str, username: str = Depends(get_current_user)):
+async def list_lectures(
+    course_name: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    username: str = Depends(get_current_user)
+):
     try:
-        courses = await get_user_courses(username)
-        if course_name not in courses:
+        not_modified, headers = await check_listing_cache(request, username, f"lectures/{course_name}", cursor, limit)
+        if not_modified:
+            return not_modified
+        if not await course_exists(username, course_name):
             raise HTTPException(status_code=404, detail="Course not found")
-        lectures = await get_user_lectures(username, course_name)
-        logger.info(f"Lectures retrieved for {username}/{course_name}")
-        return JSONResponse(
-            content={"lectures": [lec["name"] for lec in lectures]},
-            headers=get_cors_headers()
+        lectures, next_cursor = await paginate_names(
+            lectures_collection, {"username": username, "course_name": course_name}, "lecture_name", cursor, limit
         )
+        logger.info("Lectures retrieved for %s/%s", username, course_name)
+        return APIResponse(
+            content={"lectures": lectures, "next_cursor": next_cursor},
+            headers=headers
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Lectures retrieval error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not retrieve lectures")
 
+@app.delete("/lectures/{course_name}/{lecture_name}", response_model=dict)
+async def delete_lecture(course_name: str, lecture_name: str, username: str = Depends(get_current_user)):
+    try:
+        require_database()
+        key = {"username": username, "course_name": course_name, "lecture_name": lecture_name}
+        lecture = await lectures_collection.find_one(key, {"_id": 0, "file_path": 1})
+        if not lecture:
+            raise HTTPException(status_code=404, detail="Lecture not found")
+        # Unindex first: if it fails the lecture is still there and the delete can be retried
+        with span("search.unindex"):
+            await unindex_lecture(username, course_name, lecture_name)
+        await lectures_collection.delete_one(key)
+        await bump_user_version(username)
+        cleanup_lecture_files(lecture.get("file_path"))
+        logger.info("Lecture %s deleted for %s/%s", lecture_name, username, course_name)
+        return APIResponse(
+            content={"message": f"Lecture '{lecture_name}' deleted"},
+            headers=get_cors_headers()
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Lecture deletion error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not delete lecture")
+
+@app.get("/search", response_model=dict)
+async def search_lectures(
+    q: str = Query(..., min_length=1, max_length=200),
+    course_name: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    username: str = Depends(get_current_user)
+):
+    """Rank the user's lectures for q with BM25 over the inverted index; no LLM involved."""
+    try:
+        require_database()
+        terms = search_index.query_terms(q)
+        stats = await search_stats_collection.find_one({"username": username}, {"_id": 0})
+        if not terms or not stats or stats.get("doc_count", 0) <= 0:
+            return APIResponse(content={"query": q, "results": []}, headers=get_cors_headers())
+        doc_count = stats["doc_count"]
+        avg_length = stats["total_length"] / doc_count
+
+        with span("search.postings", terms=len(terms)) as postings_span:
+            postings = await search_postings_collection.find(
+                {"username": username, "term": {"$in": terms}},
+                {"_id": 0, "term": 1, "course_name": 1, "lecture_name": 1, "tf": 1, "dl": 1, "pages": 1}
+            ).to_list(None)
+            if postings_span:
+                postings_span.set_tag("postings", len(postings))
+
+        # Document frequencies over all of the user's lectures, even when filtering by course
+        df = {}
+        for posting in postings:
+            df[posting["term"]] = df.get(posting["term"], 0) + 1
+        scores, pages = {}, {}
+        for posting in postings:
+            if course_name and posting["course_name"] != course_name:
+                continue
+            key = (posting["course_name"], posting["lecture_name"])
+            scores[key] = scores.get(key, 0.0) + search_index.bm25(
+                posting["tf"], posting["dl"], avg_length, df[posting["term"]], doc_count
+            )
+            pages.setdefault(key, set()).update(posting["pages"])
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+        with span("search.snippets", results=len(top)):
+            lectures = {}
+            if top:
+                async for lecture in lectures_collection.find(
+                    {"username": username, "$or": [{"course_name": c, "lecture_name": l} for (c, l), _ in top]},
+                    {"_id": 0, "course_name": 1, "lecture_name": 1, "lecture_text": 1, "page_offsets": 1}
+                ):
+                    lectures[(lecture["course_name"], lecture["lecture_name"])] = decompress_fields(lecture, LECTURE_TEXT_FIELDS)
+            results = []
+            for key, score in top:
+                lecture = lectures.get(key)
+                if lecture is None:
+                    # Postings left behind by an interrupted delete
+                    continue
+                result = {
+                    "course_name": key[0],
+                    "lecture_name": key[1],
+                    "score": round(score, 4),
+                    "pages": sorted(pages[key]),
+                    # Hits past the stored (truncated) lecture_text have a page but no snippet
+                    "page": min(pages[key]),
+                    "snippet": None
+                }
+                result.update(search_index.snippet(lecture["lecture_text"], terms, lecture.get("page_offsets")))
+                results.append(result)
+        logger.info("Search for %s: %s terms, %s results", username, len(terms), len(results))
+        return APIResponse(content={"query": q, "results": results}, headers=get_cors_headers())
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Search failed")
+
 @app.post("/study", response_model=dict)
-async def generate_study_content(request: StudyRequest, username: str = Depends(get_current_user)):
-    logger.debug(f"Study request: task={request.task}, lecture={request.lecture_name}, user={username}")
+async def generate_study_content(request: StudyRequest, http_request: Request, username: str = Depends(get_current_user)):
+    logger.debug("Study request: task=%s, lecture=%s, user=%s", request.task, request.lecture_name, username)
     try:
-        lecture = await lectures_collection.find_one({"username": username, "lecture_name": request.lecture_name})
+        require_database()
+        with span("mongo.find_lecture"):
+            lecture = await get_lecture(username, request.lecture_name)
         if not lecture:
             logger.error(f"Lecture {request.lecture_name} not found for {username}")
             raise HTTPException(status_code=404, detail="Lecture not found")
@@ -864,29 +1787,77 @@ async def generate_study_content(request: StudyRequest, username: str = Depends(
             logger.error("Custom Question task requires a question")
             raise HTTPException(status_code=400, detail="Question required")
         
+        
+        text_hash = hashlib.sha256(lecture["lecture_text"].encode()).hexdigest()
+        cached_vector = None
+        if request.task == "Custom Question":
+            with span("semantic_cache.lookup") as cache_span:
+                cached_answer, cached_vector = await semantic_cache.lookup(text_hash, request.question)
+                if cache_span:
+                    cache_span.set_tag("hit", cached_answer is not None)
+            if cached_answer is not None:
+                logger.info("Semantic cache hit for %s/%s", username, request.lecture_name)
+                return APIResponse(
+                    content={"content": cached_answer},
+                    headers={**get_cors_headers(), "X-Cache": "HIT"}
+                )
+        elif request.task == "Study Pack" or request.task in STUDY_PACK_TASKS:
+            wanted = STUDY_PACK_TASKS if request.task == "Study Pack" else (request.task,)
+            with span("study_cache.lookup") as cache_span:
+                cached = await get_cached_study_content(text_hash, wanted)
+                if cache_span:
+                    cache_span.set_tag("hit", len(cached) == len(wanted))
+            if len(cached) == len(wanted):
+                logger.info("Study cache hit for %s/%s/%s", username, request.lecture_name, request.task)
+                return APIResponse(
+                    content=study_pack_content(cached) if request.task == "Study Pack" else {"content": cached[request.task]},
+                    headers={**get_cors_headers(), "X-Cache": "HIT"}
+                )
+
         check_memory_usage()
-        chat_model = get_chat_model()
-        prompt_text = STUDY_PROMPTS[request.task].format(
-            text=lecture["lecture_text"],
-            question=request.question or ""
-        )
-        logger.debug(f"Prompt length: {len(prompt_text)} characters")
+        with span("prompt.format"):
+            prompt_text = STUDY_PROMPTS[request.task].format(
+                text=lecture["lecture_text"],
+                question=request.question or ""
+            )
+        logger.debug("Prompt length: %s characters", len(prompt_text))
         
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(chat_model.invoke, prompt_text),
-                timeout=30
+            started = time.perf_counter()
+            max_tokens = STUDY_PACK_MAX_TOKENS if request.task == "Study Pack" else None
+            response, from_fallback = await cancel_on_disconnect(
+                http_request,
+                invoke_chat_model(prompt_text, task=request.task, max_tokens=max_tokens, with_fallback_flag=True),
+                "llm"
             )
             content = response.content
-            logger.info(f"Study content generated for {username}/{request.lecture_name}/{request.task}")
-            return JSONResponse(
-                content={"content": content},
+            result = {"content": content}
+            # A fallback model's answer is served but never cached: it would outlive the outage
+            if from_fallback:
+                logger.info(f"Not caching {request.task} for {request.lecture_name}: served by a fallback model")
+            if cached_vector is not None:
+                if not from_fallback:
+                    semantic_cache.store(
+                        text_hash, request.question, content, cached_vector, time.perf_counter() - started
+                    )
+            elif request.task == "Study Pack":
+                sections = split_study_pack(content)
+                if len(sections) < len(STUDY_PACK_TASKS):
+                    logger.warning(f"Study pack for {request.lecture_name} has sections {sorted(sections)} only")
+                if not from_fallback:
+                    await cache_study_content(text_hash, sections)
+                result = study_pack_content(sections) if sections else result
+            elif request.task in STUDY_PACK_TASKS and not from_fallback:
+                await cache_study_content(text_hash, {request.task: content})
+            logger.info("Study content generated for %s/%s/%s", username, request.lecture_name, request.task)
+            return APIResponse(
+                content=result,
                 headers=get_cors_headers()
             )
         except asyncio.TimeoutError:
             logger.error(f"ChatGroq timed out for {request.task}")
             raise HTTPException(status_code=504, detail="AI processing timed out")
-        except APIError as e:
+        except AIServiceError as e:
             logger.error(f"ChatGroq API error for {request.task}: {str(e)}")
             raise HTTPException(status_code=503, detail=f"AI service error: {str(e)}")
     except HTTPException as he:
@@ -896,10 +1867,12 @@ async def generate_study_content(request: StudyRequest, username: str = Depends(
         raise HTTPException(status_code=500, detail="Could not generate study content")
 
 @app.post("/exam", response_model=dict)
-async def generate_exam(request: ExamRequest, username: str = Depends(get_current_user)):
-    logger.debug(f"Exam request: lecture={request.lecture_name}, type={request.exam_type}, difficulty={request.difficulty}, user={username}")
+async def generate_exam(request: ExamRequest, http_request: Request, username: str = Depends(get_current_user)):
+    logger.debug("Exam request: lecture=%s, type=%s, difficulty=%s, user=%s", request.lecture_name, request.exam_type, request.difficulty, username)
     try:
-        lecture = await lectures_collection.find_one({"username": username, "lecture_name": request.lecture_name})
+        require_database()
+        with span("mongo.find_lecture"):
+            lecture = await get_lecture(username, request.lecture_name)
         if not lecture:
             logger.error(f"Lecture {request.lecture_name} not found for {username}")
             raise HTTPException(status_code=404, detail="Lecture not found")
@@ -908,29 +1881,32 @@ async def generate_exam(request: ExamRequest, username: str = Depends(get_curren
             raise HTTPException(status_code=400, detail="No lecture text available")
         
         check_memory_usage()
-        chat_model = get_chat_model()
-        prompt_text = EXAM_PROMPT.format(
-            text=lecture["lecture_text"],
-            level=request.difficulty,
-            exam_type=request.exam_type
-        )
-        logger.debug(f"Prompt length: {len(prompt_text)} characters")
+        with span("prompt.format"):
+            prompt_text = EXAM_PROMPT.format(
+                text=lecture["lecture_text"],
+                level=request.difficulty,
+                exam_type=request.exam_type,
+                question_count=EXAM_QUESTIONS_PER_LECTURE
+            )
+        logger.debug("Prompt length: %s characters", len(prompt_text))
         
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(chat_model.invoke, prompt_text),
-                timeout=30
+            response = await cancel_on_disconnect(
+                http_request,
+                invoke_chat_model(prompt_text, task="exam", max_tokens=exam_max_tokens(EXAM_QUESTIONS_PER_LECTURE)),
+                "llm"
             )
-            questions = await parse_exam(response.content, request.exam_type, request.lecture_name)
-            logger.info(f"Exam generated for {username}/{request.lecture_name}/{request.exam_type}")
-            return JSONResponse(
+            with span("parse_exam"):
+                questions = await parse_exam(response.content, request.exam_type, request.lecture_name)
+            logger.info("Exam generated for %s/%s/%s", username, request.lecture_name, request.exam_type)
+            return APIResponse(
                 content={"questions": questions},
                 headers=get_cors_headers()
             )
         except asyncio.TimeoutError:
             logger.error(f"ChatGroq timed out for exam generation")
             raise HTTPException(status_code=504, detail="AI processing timed out")
-        except APIError as e:
+        except AIServiceError as e:
             logger.error(f"ChatGroq API error for exam: {str(e)}")
             raise HTTPException(status_code=503, detail=f"AI service error: {str(e)}")
     except HTTPException as he:
@@ -939,38 +1915,156 @@ async def generate_exam(request: ExamRequest, username: str = Depends(get_curren
         logger.error(f"Exam generation error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not generate exam")
 
+@app.post("/exam/course")
+async def generate_course_exam(request: CourseExamRequest, username: str = Depends(get_current_user)):
+    """Exam over a whole course, generated per lecture concurrently and streamed as NDJSON.
+
+    question_count is split across lectures by text length and near-duplicate
+    questions are dropped. One line is sent per lecture as soon as it is done,
+    {"lecture_name", "questions"} or {"lecture_name", "error"}, so slow lectures
+    do not hold back the rest; the last line is {"done": true, ...}.
+    """
+    logger.debug("Course exam request: course=%s, type=%s, count=%s, user=%s", request.course_name, request.exam_type, request.question_count, username)
+    try:
+        require_database()
+        validate_name(request.course_name, "Course name")
+        if request.exam_type not in ("MCQs", "Essay Questions"):
+            raise HTTPException(status_code=400, detail="Exam type must be MCQs or Essay Questions")
+        if not 1 <= request.question_count <= MAX_COURSE_EXAM_QUESTIONS:
+            raise HTTPException(status_code=400, detail=f"Question count must be between 1 and {MAX_COURSE_EXAM_QUESTIONS}")
+        if not await course_exists(username, request.course_name):
+            raise HTTPException(status_code=404, detail="Course not found")
+        with span("mongo.find_lectures"):
+            lectures = {
+                lecture["lecture_name"]: decompress_text(lecture["lecture_text"])
+                for lecture in await lectures_collection.find(
+                    {"username": username, "course_name": request.course_name},
+                    {"_id": 0, "lecture_name": 1, "lecture_text": 1}
+                ).to_list(None)
+                if lecture.get("lecture_text")
+            }
+            # Weight by the full lecture's indexed word count; lecture_text is truncated to MAX_TEXT_LENGTH
+            indexed_lengths = {
+                doc["lecture_name"]: doc["length"]
+                async for doc in search_docs_collection.find(
+                    {"username": username, "course_name": request.course_name},
+                    {"_id": 0, "lecture_name": 1, "length": 1}
+                )
+            }
+        if not lectures:
+            raise HTTPException(status_code=400, detail="No lecture text available")
+        weights = {
+            name: indexed_lengths.get(name) or len(search_index.tokenize(text)) for name, text in lectures.items()
+        }
+        allocation = allocate_questions(weights, request.question_count)
+        if sum(allocation.values()) < request.question_count:
+            logger.info(
+                f"Course {request.course_name} holds only {sum(allocation.values())} of {request.question_count} "
+                f"questions at {EXAM_QUESTIONS_PER_LECTURE} per lecture"
+            )
+        check_memory_usage()
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Course exam setup error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not generate exam")
+
+    async def generate_for(lecture_name: str) -> List[Dict]:
+        # Ask for the allocation plus spares for near-duplicates, with tokens to finish all of them
+        question_count = allocation[lecture_name] + EXAM_SPARE_QUESTIONS
+        prompt_text = EXAM_PROMPT.format(
+            text=lectures[lecture_name],
+            level=request.difficulty,
+            exam_type=request.exam_type,
+            question_count=question_count
+        )
+        response = await invoke_chat_model(prompt_text, task="exam", max_tokens=exam_max_tokens(question_count))
+        return parse_exam_questions(response.content, request.exam_type, lecture_name)
+
+    async def stream_exam():
+        # Fan out to every allocated lecture; llm_slots bounds how many run at once
+        tasks = {asyncio.ensure_future(generate_for(name)): name for name in allocation}
+        seen, failed, question_count = [], [], 0
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    lecture_name = tasks[task]
+                    try:
+                        candidates = task.result()
+                    except asyncio.TimeoutError:
+                        logger.error(f"ChatGroq timed out for course exam lecture {lecture_name}")
+                        error = "AI processing timed out"
+                    except AIServiceError as e:
+                        logger.error(f"ChatGroq API error for course exam lecture {lecture_name}: {str(e)}")
+                        error = f"AI service error: {str(e)}"
+                    except Exception as e:
+                        logger.error(f"Course exam error for lecture {lecture_name}: {str(e)}", exc_info=True)
+                        error = "Could not generate questions"
+                    else:
+                        selected = []
+                        for question in candidates:
+                            if len(selected) >= allocation[lecture_name]:
+                                break
+                            fingerprint = question_fingerprint(question)
+                            if not fingerprint or is_duplicate_question(fingerprint, seen):
+                                continue
+                            seen.append(fingerprint)
+                            selected.append(question)
+                        await save_questions(selected)
+                        question_count += len(selected)
+                        yield json.dumps({"lecture_name": lecture_name, "questions": selected}) + "\n"
+                        continue
+                    failed.append(lecture_name)
+                    yield json.dumps({"lecture_name": lecture_name, "error": error}) + "\n"
+            logger.info("Course exam generated for %s/%s: %s questions from %s lectures", username, request.course_name, question_count, len(allocation) - len(failed))
+            yield json.dumps({
+                "done": True,
+                "question_count": question_count,
+                "requested": request.question_count,
+                "shortfall": request.question_count - question_count,  # lecture caps, duplicates and failures
+                "lectures": len(allocation),
+                "failed": failed
+            }) + "\n"
+        finally:
+            # Also reached when the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_exam(), media_type="application/x-ndjson", headers=get_cors_headers())
+
 @app.post("/exam/grade", response_model=dict)
-async def grade_answer_endpoint(answer: AnswerSubmit, username: str = Depends(get_current_user)):
-    logger.debug(f"Grade request: question_id={answer.question_id}, user={username}")
+async def grade_answer_endpoint(answer: AnswerSubmit, request: Request, username: str = Depends(get_current_user)):
+    logger.debug("Grade request: question_id=%s, user=%s", answer.question_id, username)
     try:
-        question = await questions_collection.find_one({"id": answer.question_id})
+        require_database()
+        with span("mongo.find_question"):
+            question = await questions_collection.find_one({"id": answer.question_id})
         if not question:
             logger.error(f"Question {answer.question_id} not found")
             raise HTTPException(status_code=404, detail="Question not found")
         
         check_memory_usage()
-        chat_model = get_chat_model()
-        prompt_text = GRADING_PROMPT.format(
-            question=question["question"],
-            answer=answer.answer,
-            correct_answer=question["correct_answer"] if question["type"] == "mcq" else "No predefined answer"
-        )
-        logger.debug(f"Prompt length: {len(prompt_text)} characters")
+        with span("prompt.format"):
+            prompt_text = GRADING_PROMPT.format(
+                question=question["question"],
+                answer=answer.answer,
+                correct_answer=question["correct_answer"] if question["type"] == "mcq" else "No predefined answer"
+            )
+        logger.debug("Prompt length: %s characters", len(prompt_text))
         
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(chat_model.invoke, prompt_text),
-                timeout=30
-            )
-            logger.info(f"Answer graded for {username}/{question['lecture_name']}/{answer.question_id}")
-            return JSONResponse(
+            response = await cancel_on_disconnect(request, invoke_chat_model(prompt_text, task="grading"), "llm")
+            logger.info("Answer graded for %s/%s/%s", username, question['lecture_name'], answer.question_id)
+            return APIResponse(
                 content={"feedback": response.content},
                 headers=get_cors_headers()
             )
         except asyncio.TimeoutError:
             logger.error("ChatGroq timed out for grading")
             raise HTTPException(status_code=504, detail="AI processing timed out")
-        except APIError as e:
+        except AIServiceError as e:
             logger.error(f"ChatGroq API error for grading: {str(e)}")
             raise HTTPException(status_code=503, detail=f"AI service error: {str(e)}")
     except HTTPException as he:
@@ -979,8 +2073,22 @@ async def grade_answer_endpoint(answer: AnswerSubmit, username: str = Depends(ge
         logger.error(f"Grading error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not grade answer")
 
+@app.get("/health/live")
+async def liveness_check():
+    return APIResponse(content={"status": "alive"}, headers=get_cors_headers())
+
+@app.get("/health/ready")
+async def readiness_check():
+    ready = startup_state["mongodb"] == "connected"
+    return APIResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", **startup_state},
+        headers=get_cors_headers()
+    )
+
 @app.get("/health")
 async def health_check():
+    import psutil
     try:
         if client:
             await client.admin.command('ping')
@@ -990,7 +2098,7 @@ async def health_check():
         disk = psutil.disk_usage('/')
         volume_writable = check_volume_writable()
         logger.info("Health check completed")
-        return JSONResponse(
+        return APIResponse(
             content={
                 "status": "healthy" if volume_writable else "unhealthy",
                 "mongodb": "connected" if client else "disconnected",
@@ -1004,14 +2112,28 @@ async def health_check():
         logger.error(f"Health check error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Health check failed")
 
+@app.get("/metrics")
+async def metrics():
+    return APIResponse(
+        content={
+            "worker": os.getpid(),
+            "semantic_cache": semantic_cache.stats(),
+            "cancelled": cancelled_work,
+            "storage_reclaim": storage_reconciler.stats(),
+            "models": model_router.as_dict()
+        },
+        headers=get_cors_headers()
+    )
+
 @app.get("/resources")
 async def resource_check():
+    import psutil
     try:
         mem = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         volume_writable = check_volume_writable()
         logger.info("Resource check completed")
-        return JSONResponse(
+        return APIResponse(
             content={
                 "memory": {
                     "total": f"{mem.total/1024/1024:.2f} MB",
@@ -1034,8 +2156,10 @@ async def resource_check():
         logger.error(f"Resource check error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Resource check failed")
 
+startup_state["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8080))
-    logger.info(f"Starting server on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    logger.info("Starting server on port %s with %s worker(s)", port, WEB_CONCURRENCY)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=WEB_CONCURRENCY)
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", "llama3-70b-8192,llama3-8b-8192").split(",") if m.strip()]
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama3-8b-8192")
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", 2.0))  # never hedge earlier than this
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", 10.0))  # until p95 is known
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", 5))  # consecutive failures that open the circuit
+LLM_CIRCUIT_ERROR_RATE = float(os.getenv("LLM_CIRCUIT_ERROR_RATE", 0.5))  # rolling error rate that opens it
+LLM_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", 30.0))
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", 50))  # calls kept per model (and max_tokens) for p95/error rate
+MIN_SAMPLES = 10
+
+
+class ModelStats:
+    """Rolling latency/error window and circuit breaker state for one model.
+
+    Latencies are kept per max_tokens budget (None for the model default):
+    a 1500-token completion is not slow by the p95 of 256-token ones.
+    """
+
+    def __init__(self, name: str, window: int = LLM_STATS_WINDOW):
+        self.name = name
+        self.window = window
+        self.latencies: Dict[Optional[int], deque] = {}
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.calls = 0
+        self.hedges = 0
+
+    def p95(self, max_tokens: Optional[int] = None) -> Optional[float]:
+        latencies = self.latencies.get(max_tokens, ())
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= LLM_CIRCUIT_COOLDOWN_SECONDS:
+            return "half-open"
+        return "open"
+
+    def available(self) -> bool:
+        return self.state != "open"
+
+    def record_latency(self, latency: float, max_tokens: Optional[int] = None):
+        self.latencies.setdefault(max_tokens, deque(maxlen=self.window)).append(latency)
+
+    def record_success(self, latency: float, max_tokens: Optional[int] = None):
+        self.calls += 1
+        self.record_latency(latency, max_tokens)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.opened_at = None
+
+    def record_failure(self):
+        self.calls += 1
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        sustained = len(self.outcomes) >= MIN_SAMPLES and self.error_rate() >= LLM_CIRCUIT_ERROR_RATE
+        if self.state == "half-open" or self.consecutive_failures >= LLM_CIRCUIT_FAILURES or sustained:
+            if self.state != "open":
+                logger.warning(
+                    f"Circuit for {self.name} opened ({self.consecutive_failures} consecutive failures, "
+                    f"error rate {self.error_rate():.0%})"
+                )
+            self.opened_at = time.monotonic()
+
+    def record_slow(self, latency: float, max_tokens: Optional[int] = None):
+        """A call cancelled after outliving its hedge delay or the overall timeout."""
+        self.record_latency(latency, max_tokens)
+        self.record_failure()
+
+    def as_dict(self) -> Dict:
+        def p95_ms(max_tokens):
+            p95 = self.p95(max_tokens)
+            return round(p95 * 1000, 1) if p95 is not None else None
+
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "hedged_to": self.hedges,
+            "error_rate": round(self.error_rate(), 4),
+            "p95_ms": p95_ms(None),
+            "p95_ms_by_max_tokens": {
+                str(max_tokens): p95_ms(max_tokens) for max_tokens in self.latencies if max_tokens is not None
+            },
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class ModelRouter:
+    """Routes completions across an ordered list of models.
+
+    The first model with a closed (or half-open) circuit is the primary and the
+    next one the fallback. If the primary has not answered within its rolling
+    p95 latency for the same max_tokens a hedged request goes to the fallback
+    and the first success wins; a primary error fails over to the fallback
+    immediately. Calls cancelled after outliving their hedge delay (or at the
+    overall timeout) count as slow failures, so a hung model raises its p95 and
+    opens its circuit.
+    `invoke(model_name, prompt, **kwargs)` performs the actual provider call.
+    """
+
+    def __init__(
+        self,
+        invoke: Callable[..., Awaitable],
+        models: List[str] = LLM_MODELS,
+        fast_model: Optional[str] = LLM_FAST_MODEL,
+    ):
+        self.invoke = invoke
+        self.models = list(models)
+        self.fast_model = fast_model if fast_model in self.models else None
+        self.stats = {name: ModelStats(name) for name in self.models}
+
+    def preference(self, prefer_fast: bool = False) -> List[str]:
+        """All models in the order they are tried when every circuit is closed."""
+        order = list(self.models)
+        if prefer_fast and self.fast_model:
+            order.remove(self.fast_model)
+            order.insert(0, self.fast_model)
+        return order
+
+    def candidates(self, prefer_fast: bool = False) -> List[str]:
+        order = self.preference(prefer_fast)
+        available = [name for name in order if self.stats[name].available()]
+        # With every circuit open, still try the preferred model rather than failing outright
+        return available or order[:1]
+
+    def hedge_delay(self, model_name: str, max_tokens: Optional[int] = None) -> float:
+        p95 = self.stats[model_name].p95(max_tokens)
+        return max(LLM_HEDGE_MIN_SECONDS, p95 if p95 is not None else LLM_HEDGE_DEFAULT_SECONDS)
+
+    async def _call(self, model_name: str, prompt: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await self.invoke(model_name, prompt, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats[model_name].record_failure()
+            raise
+        self.stats[model_name].record_success(time.perf_counter() - started, kwargs.get("max_tokens"))
+        return result
+
+    async def complete(self, prompt: str, prefer_fast: bool = False, timeout: Optional[float] = None, **kwargs) -> tuple:
+        """Return (result, model_name); raise asyncio.TimeoutError if no model answers within timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        order = self.candidates(prefer_fast)
+        primary, fallbacks = order[0], order[1:]
+        max_tokens = kwargs.get("max_tokens")
+        tasks = {}  # task -> (model_name, started, hedge delay)
+
+        def start(model_name: str) -> Optional[float]:
+            """Start a call; return when to hedge it, or None without a fallback left."""
+            delay = self.hedge_delay(model_name, max_tokens)
+            tasks[asyncio.ensure_future(self._call(model_name, prompt, **kwargs))] = (model_name, loop.time(), delay)
+            return loop.time() + delay if fallbacks else None
+
+        hedge_at = start(primary)
+        last_error = None
+        timed_out = False
+        try:
+            while tasks:
+                wake_at = min((t for t in (hedge_at, deadline) if t is not None), default=None)
+                wait = max(0.0, wake_at - loop.time()) if wake_at is not None else None
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model_name = tasks.pop(task)[0]
+                    if task.exception() is None:
+                        return task.result(), model_name
+                    last_error = task.exception()
+                    logger.warning(f"Model {model_name} failed: {str(last_error)}")
+                if not done and deadline is not None and loop.time() >= deadline:
+                    timed_out = True
+                    raise asyncio.TimeoutError(f"No model answered within {timeout:.1f}s")
+                if fallbacks and (not done or not tasks):
+                    # Primary is slower than its p95 (hedge) or it failed (fail over)
+                    fallback = fallbacks.pop(0)
+                    if not done:
+                        self.stats[fallback].hedges += 1
+                        logger.info(f"Hedging {primary} with {fallback} after {self.hedge_delay(primary, max_tokens):.1f}s")
+                    hedge_at = start(fallback)
+                elif not done:
+                    hedge_at = None
+            raise last_error
+        finally:
+            now = loop.time()
+            for task, (model_name, started, delay) in tasks.items():
+                if task.done():
+                    continue
+                task.cancel()
+                # A loser past its hedge delay, or anything cut off by the timeout, was slow:
+                # record it, or a hung model would never be measured and never trip its circuit
+                elapsed = now - started
+                if timed_out or elapsed >= delay:
+                    self.stats[model_name].record_slow(max(elapsed, delay), max_tokens)
+
+    def as_dict(self) -> Dict:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
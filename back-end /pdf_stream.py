@@ -0,0 +1,52 @@
+import hashlib
+
+PDF_HEADER = b"%PDF-"
+PDF_EOF = b"%%EOF"
+HEADER_WINDOW = 1024  # readers accept the header anywhere in the first 1 KB
+OVERLAP = 16  # bytes kept from the previous chunk so markers split across chunks are seen
+
+
+class InvalidPdfUpload(ValueError):
+    """The bytes received so far already rule the upload out; the message is client-facing."""
+
+
+class PdfStreamInspector:
+    """Cheap structural checks on a PDF while it streams in, plus its sha256.
+
+    Rejects only on certain evidence: a missing %PDF- header as soon as the
+    first 1 KB has arrived, and at finish() a file without any %%EOF marker
+    (PyPDF2 searches the whole file for one, so trailing padding is fine).
+    Encryption and page counts are left to validate_pdf: "/Encrypt" can
+    appear in content streams and names, and incremental saves keep
+    superseded page objects, so byte matching would reject valid files.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._head = b""
+        self._tail = b""
+        self._seen_eof = False
+
+    def feed(self, chunk: bytes):
+        self._sha256.update(chunk)
+        if len(self._head) < HEADER_WINDOW:
+            self._head += chunk[:HEADER_WINDOW - len(self._head)]
+            if len(self._head) == HEADER_WINDOW and PDF_HEADER not in self._head:
+                raise InvalidPdfUpload("Invalid PDF")
+        self.size += len(chunk)
+
+        window = self._tail + chunk
+        self._seen_eof = self._seen_eof or PDF_EOF in window
+        self._tail = window[-OVERLAP:]
+
+    def finish(self):
+        """Checks that need the whole upload; call once after the last chunk."""
+        if PDF_HEADER not in self._head:
+            raise InvalidPdfUpload("Invalid PDF")
+        if not self._seen_eof:
+            raise InvalidPdfUpload("Invalid PDF (truncated upload)")
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
@@ -0,0 +1,81 @@
+import bisect
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 10
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how if in into is it its of on or "
+    "that the their then there these this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[tuple]:
+    """Return (term, offset) pairs for the indexable words of text."""
+    return [
+        (match.group(), match.start())
+        for match in TOKEN_PATTERN.finditer(text.lower())
+        if len(match.group()) > 1 and match.group() not in STOPWORDS
+    ]
+
+
+def page_offsets(pages: List[str], separator: str = "\n") -> List[int]:
+    """Start offset of each page in separator.join(pages)."""
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page) + len(separator)
+    return offsets
+
+
+def page_of(offset: int, offsets: Optional[List[int]]) -> int:
+    """1-based page number containing offset (1 when page boundaries are unknown)."""
+    if not offsets:
+        return 1
+    return max(1, bisect.bisect_right(offsets, offset))
+
+
+def analyze(text: str, offsets: Optional[List[int]] = None) -> tuple:
+    """Return (document length, {term: (term frequency, sorted page numbers)})."""
+    tokens = tokenize(text)
+    frequencies = defaultdict(int)
+    pages = defaultdict(set)
+    for term, offset in tokens:
+        frequencies[term] += 1
+        pages[term].add(page_of(offset, offsets))
+    return len(tokens), {term: (tf, sorted(pages[term])) for term, tf in frequencies.items()}
+
+
+def query_terms(query: str) -> List[str]:
+    terms = []
+    for term, _ in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def bm25(tf: int, doc_length: int, avg_length: float, df: int, doc_count: int) -> float:
+    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_length / max(avg_length, 1.0))
+    return idf * tf * (BM25_K1 + 1) / norm
+
+
+def snippet(text: str, terms: List[str], offsets: Optional[List[int]] = None, width: int = 160) -> Dict:
+    """Window of text around the first query term hit, with its page number ({} without a hit)."""
+    lowered = text.lower()
+    hits = [m.start() for term in terms for m in [re.search(rf"\b{re.escape(term)}\b", lowered)] if m]
+    if not hits:
+        return {}
+    position = min(hits)
+    start = max(0, position - width // 3)
+    end = min(len(text), start + width)
+    fragment = " ".join(text[start:end].split())
+    return {
+        "page": page_of(position, offsets),
+        "snippet": ("..." if start > 0 else "") + fragment + ("..." if end < len(text) else ""),
+    }
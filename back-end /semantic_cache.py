@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Each worker loads torch and the embedding model (several hundred MB per process)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.85))  # cosine similarity
+SEMANTIC_CACHE_MAX_LECTURES = int(os.getenv("SEMANTIC_CACHE_MAX_LECTURES", 256))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 64))  # answers kept per lecture
+
+
+class LectureAnswers:
+    """Answered questions for one lecture: a float16 matrix of unit embeddings plus answers."""
+
+    def __init__(self, dim: int, capacity: int):
+        import numpy as np
+        self.vectors = np.zeros((capacity, dim), dtype=np.float16)
+        self.questions: List[str] = []
+        self.answers: List[str] = []
+        self.last_used: List[float] = []
+
+    def __len__(self):
+        return len(self.answers)
+
+    def nearest(self, vector) -> tuple:
+        if not self.answers:
+            return -1, 0.0
+        scores = self.vectors[:len(self.answers)] @ vector.astype(self.vectors.dtype)
+        idx = int(scores.argmax())
+        return idx, float(scores[idx])
+
+    def add(self, vector, question: str, answer: str):
+        if len(self.answers) < self.vectors.shape[0]:
+            idx = len(self.answers)
+            self.questions.append(question)
+            self.answers.append(answer)
+            self.last_used.append(time.monotonic())
+        else:
+            # Replace the least recently used answer
+            idx = min(range(len(self.last_used)), key=self.last_used.__getitem__)
+            self.questions[idx] = question
+            self.answers[idx] = answer
+            self.last_used[idx] = time.monotonic()
+        self.vectors[idx] = vector
+
+
+class SemanticCache:
+    """Per-worker cache of Custom Question answers, keyed by lecture content hash.
+
+    Incoming questions are embedded with a sentence-transformers model and
+    compared against previously answered questions for the same lecture; a
+    stored answer is returned when the cosine similarity reaches the threshold.
+    Lectures are evicted LRU beyond max_lectures, answers LRU beyond max_entries.
+    The model is loaded by warm_up() in the background; until it is ready,
+    lookups are skipped rather than stalling the request on the load.
+    """
+
+    def __init__(
+        self,
+        model_name: str = SEMANTIC_CACHE_MODEL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_lectures: int = SEMANTIC_CACHE_MAX_LECTURES,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_lectures = max_lectures
+        self.max_entries = max_entries
+        self.lectures: "OrderedDict[str, LectureAnswers]" = OrderedDict()
+        self._model = None
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # lookups made before the model was ready
+        self.lookup_seconds = 0.0
+        self.avg_generation_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    async def warm_up(self):
+        """Load the embedding model (importing torch, possibly downloading it) off the request path."""
+        if not self.enabled:
+            return
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(self.model_name)
+        try:
+            self._model = await asyncio.to_thread(load)
+            logger.info(f"Semantic cache model {self.model_name} loaded")
+        except Exception as e:
+            self.enabled = False
+            logger.error(f"Semantic cache disabled, could not load {self.model_name}: {str(e)}")
+
+    async def embed(self, question: str):
+        if self._model is None:
+            return None
+        return await asyncio.to_thread(
+            self._model.encode, question.strip().lower(), normalize_embeddings=True
+        )
+
+    async def lookup(self, content_hash: str, question: str) -> tuple:
+        """Return (answer or None, embedding); pass the embedding back to store()."""
+        if not self.enabled:
+            return None, None
+        if not self.ready:
+            self.skipped += 1
+            return None, None
+        started = time.perf_counter()
+        vector = await self.embed(question)
+        answer = None
+        if vector is not None:
+            entries = self.lectures.get(content_hash)
+            if entries is not None:
+                self.lectures.move_to_end(content_hash)
+                idx, score = entries.nearest(vector)
+                if idx >= 0 and score >= self.threshold:
+                    entries.last_used[idx] = time.monotonic()
+                    answer = entries.answers[idx]
+                    logger.debug("Semantic cache hit (%.3f): %r ~ %r", score, question, entries.questions[idx])
+        self.lookup_seconds += time.perf_counter() - started
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer, vector
+
+    def store(self, content_hash: str, question: str, answer: str, vector, generation_seconds: float = 0.0):
+        if vector is None:
+            return
+        entries = self.lectures.get(content_hash)
+        if entries is None:
+            entries = LectureAnswers(len(vector), self.max_entries)
+            self.lectures[content_hash] = entries
+            while len(self.lectures) > self.max_lectures:
+                self.lectures.popitem(last=False)
+        self.lectures.move_to_end(content_hash)
+        entries.add(vector, question, answer)
+        # Moving average of LLM generation time: roughly what each hit saves
+        if self.avg_generation_seconds:
+            self.avg_generation_seconds = 0.9 * self.avg_generation_seconds + 0.1 * generation_seconds
+        else:
+            self.avg_generation_seconds = generation_seconds
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "model": self.model_name,
+            "threshold": self.threshold,
+            "lectures": len(self.lectures),
+            "entries": sum(len(entries) for entries in self.lectures.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(self.lookup_seconds / lookups * 1000, 2) if lookups else 0.0,
+            "avg_generation_ms": round(self.avg_generation_seconds * 1000, 2),
+        }
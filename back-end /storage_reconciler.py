@@ -0,0 +1,174 @@
+import asyncio
+import datetime
+import fcntl
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RECLAIM_INTERVAL_SECONDS = float(os.getenv("RECLAIM_INTERVAL_SECONDS", 900))  # 0 disables the reconciler
+RECLAIM_MIN_AGE_SECONDS = float(os.getenv("RECLAIM_MIN_AGE_SECONDS", 3600))  # younger files may be mid-upload
+RECLAIM_USERS_PER_PASS = int(os.getenv("RECLAIM_USERS_PER_PASS", 50))
+RECLAIM_DELETES_PER_SECOND = float(os.getenv("RECLAIM_DELETES_PER_SECOND", 20))
+RECLAIM_DRY_RUN = os.getenv("RECLAIM_DRY_RUN", "false").lower() in ("1", "true", "yes")
+
+
+def is_temp_file(name: str) -> bool:
+    """Upload temp files (NamedTemporaryFile tmp*.pdf) and bulk-import partial copies (*.pdf.part)."""
+    return (name.startswith("tmp") and name.endswith(".pdf")) or name.endswith(".pdf.part")
+
+
+class StorageReconciler:
+    """Reclaims disk space from PDFs that no lecture references.
+
+    Walks USER_DATA_DIR/<user>/lectures a few users per pass, resuming where
+    the previous pass stopped, and removes files older than min_age whose name
+    no lecture document of that user points at: temp files left by a crashed
+    upload or import, PDFs whose lecture insert failed after the rename, and
+    PDFs of deleted lectures. Deletions are paced at deletes_per_second and
+    only the worker holding the lock file runs a pass.
+    `referenced_files(username)` returns the file names in use, or None if
+    that cannot be determined (the user is then skipped). A user with no
+    referenced files but lecture PDFs on disk is skipped too: that looks
+    like a wrong or emptied database rather than orphans.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        referenced_files: Callable[[str], Awaitable[Optional[Set[str]]]],
+        lock_path: str,
+        interval: float = RECLAIM_INTERVAL_SECONDS,
+        min_age: float = RECLAIM_MIN_AGE_SECONDS,
+        users_per_pass: int = RECLAIM_USERS_PER_PASS,
+        deletes_per_second: float = RECLAIM_DELETES_PER_SECOND,
+        dry_run: bool = RECLAIM_DRY_RUN,
+    ):
+        self.root = root
+        self.referenced_files = referenced_files
+        self.lock_path = lock_path
+        self.interval = interval
+        self.min_age = min_age
+        self.users_per_pass = users_per_pass
+        self.deletes_per_second = deletes_per_second
+        self.dry_run = dry_run
+        self._cursor = ""  # last user visited; the next pass continues after it
+        self.totals = {"passes": 0, "temp_files_removed": 0, "orphans_removed": 0, "bytes_reclaimed": 0}
+        self.last_pass: Optional[Dict] = None
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_pass()
+            except Exception as e:
+                logger.error(f"Storage reconciliation failed: {str(e)}", exc_info=True)
+
+    async def run_pass(self) -> Optional[Dict]:
+        lock_file = await asyncio.to_thread(self._try_lock)
+        if lock_file is None:
+            logger.debug("Storage reconciliation running in another worker")
+            return None
+        started = time.perf_counter()
+        report = {"users": 0, "temp_files_removed": 0, "orphans_removed": 0, "bytes_reclaimed": 0}
+        try:
+            for username in self._next_users(await asyncio.to_thread(self._list_users)):
+                report["users"] += 1
+                try:
+                    await self._reconcile_user(username, report)
+                except Exception as e:
+                    logger.error(f"Storage reconciliation for {username} failed: {str(e)}")
+        finally:
+            lock_file.close()
+        self.totals["passes"] += 1
+        for key in ("temp_files_removed", "orphans_removed", "bytes_reclaimed"):
+            self.totals[key] += report[key]
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        report["finished_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        self.last_pass = report
+        logger.info(
+            "Storage reconciliation%s: %s users, %s temp files and %s orphaned PDFs, %.1f MB reclaimed in %ss",
+            " (dry run)" if self.dry_run else "", report["users"], report["temp_files_removed"],
+            report["orphans_removed"], report["bytes_reclaimed"] / 1024 / 1024, report["seconds"]
+        )
+        return report
+
+    def _try_lock(self):
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _list_users(self) -> List[str]:
+        return sorted(
+            entry.name for entry in os.scandir(self.root)
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+
+    def _next_users(self, users: List[str]) -> List[str]:
+        after = [name for name in users if name > self._cursor]
+        batch = (after + [name for name in users if name <= self._cursor])[:self.users_per_pass]
+        if batch:
+            self._cursor = batch[-1] if len(batch) < len(users) else ""
+        return batch
+
+    def _stale_files(self, username: str) -> List[os.DirEntry]:
+        lectures_dir = os.path.join(self.root, username, "lectures")
+        if not os.path.isdir(lectures_dir):
+            return []
+        cutoff = time.time() - self.min_age
+        return [
+            entry for entry in os.scandir(lectures_dir)
+            if entry.is_file(follow_symlinks=False)
+            and entry.name.endswith((".pdf", ".pdf.part"))
+            and entry.stat().st_mtime < cutoff
+        ]
+
+    async def _reconcile_user(self, username: str, report: Dict):
+        stale = await asyncio.to_thread(self._stale_files, username)
+        if not stale:
+            return
+        referenced = await self.referenced_files(username)
+        if referenced is None:
+            return
+        if not referenced and any(not is_temp_file(entry.name) for entry in stale):
+            logger.warning(
+                f"Storage reconciliation: {username} has lecture PDFs but no lectures in the database, skipping"
+            )
+            return
+        for entry in stale:
+            if entry.name in referenced:
+                continue
+            size = await self._remove(entry)
+            if size is None:
+                continue
+            report["temp_files_removed" if is_temp_file(entry.name) else "orphans_removed"] += 1
+            report["bytes_reclaimed"] += size
+            # Pace deletions so reclamation never competes with request I/O
+            if self.deletes_per_second > 0:
+                await asyncio.sleep(1 / self.deletes_per_second)
+
+    async def _remove(self, entry: os.DirEntry) -> Optional[int]:
+        """Delete entry unless it changed since the scan (e.g. an upload renamed a new file over it)."""
+        scanned = entry.stat()
+        try:
+            current = await asyncio.to_thread(os.stat, entry.path)
+            if current.st_mtime != scanned.st_mtime or current.st_ino != scanned.st_ino:
+                return None
+            if not self.dry_run:
+                await asyncio.to_thread(os.remove, entry.path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Could not remove {entry.path}: {str(e)}")
+            return None
+        logger.debug("%s %s (%s bytes)", "Would remove" if self.dry_run else "Removed", entry.path, current.st_size)
+        return current.st_size
+
+    def stats(self) -> Dict:
+        return {**self.totals, "dry_run": self.dry_run, "last_pass": self.last_pass}
@@ -0,0 +1,63 @@
+import os
+import sys
+import zlib
+from typing import Dict, Iterable, Optional
+
+# zstd when available (better ratio and much faster decompression), zlib otherwise.
+# Same module pymongo uses for zstd wire compression.
+try:
+    if sys.version_info >= (3, 14):
+        from compression import zstd
+    else:
+        from backports import zstd
+except ImportError:
+    zstd = None
+
+TEXT_COMPRESSION_MIN_SIZE = int(os.getenv("TEXT_COMPRESSION_MIN_SIZE", 512))  # bytes; shorter text is stored as-is
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+ZLIB_LEVEL = int(os.getenv("ZLIB_LEVEL", 6))
+
+
+def compress_text(text: Optional[str]):
+    """Return text in its stored form: the string itself when short, else {"codec", "data"}."""
+    if text is None:
+        return None
+    raw = text.encode()
+    if len(raw) < TEXT_COMPRESSION_MIN_SIZE:
+        return text
+    if zstd is not None:
+        return {"codec": "zstd", "data": zstd.compress(raw, level=ZSTD_LEVEL)}
+    return {"codec": "zlib", "data": zlib.compress(raw, ZLIB_LEVEL)}
+
+
+def decompress_text(value) -> Optional[str]:
+    """Inverse of compress_text; plain strings (including documents written before compression) pass through."""
+    if value is None or isinstance(value, str):
+        return value
+    codec, data = value["codec"], bytes(value["data"])
+    if codec == "zstd":
+        if zstd is None:
+            raise RuntimeError("backports.zstd is required to read zstd-compressed text")
+        return zstd.decompress(data).decode()
+    if codec == "zlib":
+        return zlib.decompress(data).decode()
+    raise ValueError(f"Unknown text codec: {codec}")
+
+
+def compress_fields(doc: Dict, fields: Iterable[str]) -> Dict:
+    """Copy of doc with the given text fields compressed, ready to be written."""
+    stored = dict(doc)
+    for field in fields:
+        if field in stored:
+            stored[field] = compress_text(stored[field])
+    return stored
+
+
+def decompress_fields(doc: Optional[Dict], fields: Iterable[str]) -> Optional[Dict]:
+    """Decompress the given fields of a document read from MongoDB, in place."""
+    if doc is None:
+        return None
+    for field in fields:
+        if field in doc:
+            doc[field] = decompress_text(doc[field])
+    return doc
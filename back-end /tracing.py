@@ -0,0 +1,254 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "student-assistant-api")
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")  # Zipkin v2 JSON spans, one per line
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL")  # e.g. http://localhost:9411/api/v2/spans
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", 0.001))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Trace:
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "tags", "start_us", "duration_us", "_t0")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: Optional[str] = None, tags: Optional[Dict] = None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = {k: str(v) for k, v in (tags or {}).items()}
+        self.start_us = int(time.time() * 1_000_000)
+        self.duration_us = None
+        self._t0 = time.perf_counter()
+
+    def set_tag(self, key: str, value):
+        self.tags[key] = str(value)
+
+    def finish(self):
+        self.duration_us = max(1, int((time.perf_counter() - self._t0) * 1_000_000))
+        if self.trace.sampled:
+            self.trace.spans.append(self)
+
+    def to_zipkin(self) -> Dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": self.start_us,
+            "duration": self.duration_us,
+            "localEndpoint": {"serviceName": TRACE_SERVICE_NAME},
+            "tags": self.tags,
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.kind:
+            span["kind"] = self.kind
+        return span
+
+
+class SpanExporter:
+    """Writes finished traces from a background thread so request handlers never block on I/O."""
+
+    def __init__(self, file_path: Optional[str] = TRACE_EXPORT_FILE, collector_url: Optional[str] = TRACE_COLLECTOR_URL):
+        self.file_path = file_path
+        self.collector_url = collector_url
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.collector_url)
+
+    def export(self, spans: List[Dict]):
+        if self._pid != os.getpid():
+            # (Re)start the writer in every worker process
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(spans)
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                while True:
+                    batch.extend(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if self.file_path:
+                    with open(self.file_path, "a") as f:
+                        f.write("".join(json.dumps(span) + "\n" for span in batch))
+                if self.collector_url:
+                    request = urllib.request.Request(
+                        self.collector_url, data=json.dumps(batch).encode(),
+                        headers={"Content-Type": "application/json"}, method="POST"
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                logger.warning(f"Span export failed ({len(batch)} spans dropped): {str(e)}")
+
+
+exporter = SpanExporter()
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+@contextmanager
+def span(name: str, **tags):
+    """Time a stage of the current request as a child span; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None or not parent.trace.sampled:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, tags=tags)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_tag("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def parse_traceparent(value: str) -> tuple:
+    """Return (trace_id, parent_span_id, sampled) from a W3C traceparent header, or Nones."""
+    parts = value.strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2], parts[3].endswith("1")
+    return None, None, None
+
+
+class TracingMiddleware:
+    """Opens a root span per HTTP request and returns its trace id in X-Trace-Id and traceparent."""
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        trace_id, parent_id, sampled = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        trace = Trace(trace_id or _new_id(128), sampled and exporter.enabled)
+        root = Span(trace, f"{scope['method']} {scope['path']}", parent_id, kind="SERVER",
+                    tags={"http.method": scope["method"], "http.path": scope["path"]})
+        token = _current_span.set(root)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set_tag("http.status_code", message["status"])
+                flags = "01" if trace.sampled else "00"
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-trace-id", trace.trace_id.encode()),
+                    (b"traceparent", f"00-{trace.trace_id}-{root.span_id}-{flags}".encode()),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            root.set_tag("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            if trace.sampled and trace.spans:
+                exporter.export([s.to_zipkin() for s in trace.spans])
+
+
+class ProfilingMiddleware:
+    """Profiles a single request when an authorized caller sends `X-Profile: 1`.
+
+    The request runs under pyinstrument's sampling profiler and the response
+    body is replaced by a speedscope profile (open it at https://speedscope.app
+    for a flamegraph); the handler's own status is in X-Profiled-Status.
+    """
+
+    def __init__(self, app, authorize: Callable[[str], bool], interval: float = PROFILE_INTERVAL_SECONDS):
+        self.app = app
+        self.authorize = authorize
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile", b"") not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        if not self.authorize(headers.get(b"authorization", b"").decode("latin-1")):
+            await self._respond(send, 403, {"error": "Profiling requires an admin token"})
+            return
+        try:
+            from pyinstrument import Profiler
+            from pyinstrument.renderers import SpeedscopeRenderer
+        except ImportError:
+            await self._respond(send, 501, {"error": "pyinstrument is not installed"})
+            return
+
+        profiled_status = 500
+
+        async def discard(message):
+            nonlocal profiled_status
+            if message["type"] == "http.response.start":
+                profiled_status = message["status"]
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        logger.info(f"Profiled {scope['method']} {scope['path']} (status {profiled_status})")
+        await self._respond(send, 200, profiler.output(SpeedscopeRenderer()),
+                            extra_headers=[(b"x-profiled-status", str(profiled_status).encode())])
+
+    @staticmethod
+    async def _respond(send, status: int, content, extra_headers=None):
+        body = content.encode() if isinstance(content, str) else json.dumps(content).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ] + (extra_headers or []),
+        })
+        await send({"type": "http.response.body", "body": body})
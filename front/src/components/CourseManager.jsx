@@ -13,10 +13,18 @@ const CourseManager = ({ setView, setSelectedCourse, token }) => {
     const fetchCourses = async () => {
       setLoading(true);
       try {
-        const response = await axios.get(`${process.env.REACT_APP_API_BASE_URL}/courses`, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-        setCourses(response.data.courses || []);
+        // The API pages its listings; follow next_cursor until every course is loaded
+        let allCourses = [];
+        let cursor = null;
+        do {
+          const response = await axios.get(`${process.env.REACT_APP_API_BASE_URL}/courses`, {
+            headers: { Authorization: `Bearer ${token}` },
+            params: cursor ? { cursor } : {}
+          });
+          allCourses = allCourses.concat(response.data.courses || []);
+          cursor = response.data.next_cursor;
+        } while (cursor);
+        setCourses(allCourses);
       } catch (err) {
         toast.error(err.response?.data?.error || 'Failed to fetch courses');
       } finally {
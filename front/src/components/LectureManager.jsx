@@ -30,6 +30,25 @@ const LectureManager = ({ selectedCourse, setView, setSelectedLecture, token })
     checkResources();
   }, [token]);
 
+  // The API pages its listings; follow next_cursor until every lecture is loaded
+  const fetchAllLectures = async () => {
+    let allLectures = [];
+    let cursor = null;
+    do {
+      const response = await axios.get(
+        `${process.env.REACT_APP_API_BASE_URL}/lectures/${selectedCourse}`,
+        {
+          headers: { Authorization: `Bearer ${token}` },
+          params: cursor ? { cursor } : {},
+          timeout: 10000
+        }
+      );
+      allLectures = allLectures.concat(response.data.lectures || []);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return allLectures;
+  };
+
   // Fetch lectures
   useEffect(() => {
     if (!selectedCourse) return;
@@ -37,14 +56,7 @@ const LectureManager = ({ selectedCourse, setView, setSelectedLecture, token })
     const fetchLectures = async () => {
       setLoading(true);
       try {
-        const response = await axios.get(
-          `${process.env.REACT_APP_API_BASE_URL}/lectures/${selectedCourse}`,
-          {
-            headers: { Authorization: `Bearer ${token}` },
-            timeout: 10000
-          }
-        );
-        setLectures(response.data.lectures || []);
+        setLectures(await fetchAllLectures());
       } catch (err) {
         handleApiError(err, 'Failed to fetch lectures');
       } finally {
@@ -152,15 +164,7 @@ const LectureManager = ({ selectedCourse, setView, setSelectedLecture, token })
 
       clearTimeout(timeout);
       
-      const response = await axios.get(
-        `${process.env.REACT_APP_API_BASE_URL}/lectures/${selectedCourse}`,
-        {
-          headers: { Authorization: `Bearer ${token}` },
-          timeout: 10000
-        }
-      );
-      
-      setLectures(response.data.lectures || []);
+      setLectures(await fetchAllLectures());
       setLectureName('');
       setFile(null);
       
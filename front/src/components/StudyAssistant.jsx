@@ -9,7 +9,7 @@ const StudyAssistant = ({ selectedLecture, setView, token }) => {
   const [content, setContent] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
-  const tasks = ['Summarize', 'Explain', 'Examples', 'Custom Question'];
+  const tasks = ['Summarize', 'Explain', 'Examples', 'Study Pack', 'Custom Question'];
 
   const handleGenerate = async () => {
     if (!selectedLecture) {